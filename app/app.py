@@ -7,6 +7,7 @@
 import os
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import plotly.express as px
 import plotly.graph_objects as go
 import dash
@@ -30,6 +31,9 @@ GROUPS = {
 # =======================
 # Load Generation Dataset
 # =======================
+# Written by src/data/client_coes.py (GEN_SCHEMA_VERSION): categorical names,
+# float32 power and tz-aware America/Lima dates, so no re-coercion is needed.
+GEN_SCHEMA_VERSION = "1"
 PARQUET_CANDIDATES = [
     os.environ.get("DATASET_PATH"),
     "../dataset/currentGen.parquet",
@@ -40,16 +44,19 @@ parquet_path = next((p for p in PARQUET_CANDIDATES if p and os.path.exists(p)),
 if not parquet_path:
     raise FileNotFoundError("currentGen.parquet not found")
 
+gen_schema_version = (pq.read_schema(parquet_path).metadata or {}).get(b"gen_schema_version", b"").decode()
 dataset = pd.read_parquet(parquet_path)
-print(f"[OK] Data loaded from: {parquet_path} | shape={dataset.shape}")
+print(f"[OK] Data loaded from: {parquet_path} | shape={dataset.shape} | schema={gen_schema_version or 'none'}")
 
 # Validaciones mínimas
 expected_cols = {"name", "date", "power"}
 missing = expected_cols - set(dataset.columns)
 if missing:
     raise ValueError(f"Missing required columns: {missing}")
-dataset = dataset.copy()
-dataset["date"] = pd.to_datetime(dataset["date"])
+if gen_schema_version != GEN_SCHEMA_VERSION:
+    print(f"[WARN] currentGen.parquet schema '{gen_schema_version}' != '{GEN_SCHEMA_VERSION}'; coercing columns")
+    dataset = dataset.copy()
+    dataset["date"] = pd.to_datetime(dataset["date"])
 
 # =======================
 # Load Wind Forecast Dataset
@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/bench_clients.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# End-to-end client throughput against the offline stand-ins
+# (replay_server for COES / Open-Meteo, ee_shim for Earth Engine).
+#   python bench_clients.py --latency 0.05 --days 30 --ee-modes json table chip
+#   python bench_clients.py --mode replay --record-dir ./cassettes
+#-----------------------------------------------------
+#-- Modules --#
+import time
+import logging
+import argparse
+import datetime
+import ee_shim
+from replay_server import ReplayServer  # importing synthetic puts src/data on sys.path
+
+def _report(client, variant, rows, seconds, nBytes):
+    print(f"{client:<8} {variant:<22} {rows:>9} {seconds:>8.2f} {rows / seconds:>11.0f} "
+          f"{nBytes / seconds / 1024 ** 2:>9.2f}")
+
+def benchCoes(server, days, workers, stream):
+    from client_coes import fetchCoesConcurrent, prepareDataset
+    end = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=days)
+    start = end - datetime.timedelta(days=days)
+    bytes0, tic = server.bytes, time.perf_counter()
+    dataset = fetchCoesConcurrent(range(0, 4), server.url, start, end, stream=stream,
+                                  maxWorkers=workers, timeout=60, deadline=600)
+    dataset = prepareDataset(dataset)
+    _report('COES', f"{'stream' if stream else 'json'} x{workers}", len(dataset),
+            time.perf_counter() - tic, server.bytes - bytes0)
+
+def benchEra5(server, days, workers, batched):
+    from client_ecwmf import ECMWFReanalysisClient
+    from client_eeforecast import WIND_FARMS
+    client = ECMWFReanalysisClient(wind_farms=WIND_FARMS, max_workers=workers)
+    client.ERA5_URL = f'{server.url}v1/era5'
+    end = datetime.datetime(2025, 1, 1)
+    start = end - datetime.timedelta(days=days)
+    bytes0, tic = server.bytes, time.perf_counter()
+    df = client.fetch_range_for_all(start, end, batched=batched, filepath=None)
+    _report('ERA5', f"{'batched' if batched else 'per point'} x{workers}", len(df),
+            time.perf_counter() - tic, server.bytes - bytes0)
+
+def benchEarthEngine(server, modes, workers):
+    import client_eeforecast as eef
+    eef.GEE_Client._initialized = True
+    if ee_shim.STATE['cassette'] is not None:
+        workers = 1  # cassette payloads replay in call order
+    fc = eef.feature_collection_from_list(eef.WIND_FARMS)
+    end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = end - datetime.timedelta(days=7)
+    for model, cls in (('GFS', eef.gfsForecast), ('IFS', eef.ifsForecast)):
+        inits = cls(eFeaturesLocations=fc).available_inits(
+            start_date=start.strftime('%Y-%m-%d'), end_date=end.strftime('%Y-%m-%dT%H:%M:%S'))
+        for mode in modes:
+            def job(group, mode=mode, cls=cls):
+                def _run():
+                    fcs = cls(eFeaturesLocations=fc, points=eef.WIND_FARMS)
+                    fcs.getForecasts(initDates=group)
+                    return fcs.getDataFrame(mode=mode)
+                return _run
+            jobs = {i: job(inits[i:i + 4]) for i in range(0, len(inits), 4)}
+            bytes0, tic = eef.EEStats.bytes, time.perf_counter()
+            rows = sum(len(df) for _, df in eef.run_extractions(jobs, max_workers=workers))
+            _report('EE', f'{model} {mode} x{workers}', rows, time.perf_counter() - tic,
+                    eef.EEStats.bytes - bytes0)
+
+def run(cli):
+    server = ReplayServer(latency=cli.latency, mode=cli.mode, record_dir=cli.record_dir,
+                          nEquipment=cli.equipment).start()
+    cassette = ee_shim.Cassette.load(cli.cassette) if cli.cassette else None
+    ee_shim.install(server=server, cassette=cassette, gfs_max_lead=cli.gfs_max_lead)
+    logging.disable(logging.INFO)
+    print(f"{'client':<8} {'variant':<22} {'rows':>9} {'seconds':>8} {'rows/s':>11} {'MiB/s':>9}")
+    try:
+        for workers in cli.workers:
+            benchCoes(server, cli.days, workers, stream=False)
+            benchCoes(server, cli.days, workers, stream=True)
+            benchEra5(server, cli.days, workers, batched=False)
+            benchEra5(server, cli.days, workers, batched=True)
+            benchEarthEngine(server, cli.ee_modes, workers)
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline client throughput benchmark')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every HTTP response')
+    parser.add_argument('--days', type=int, default=30, help='COES / ERA5 window length')
+    parser.add_argument('--equipment', type=int, default=None, help='COES equipment rows per day')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--mode', choices=['synthetic', 'replay', 'record'], default='synthetic')
+    parser.add_argument('--record-dir', default=None, help='recorded HTTP bodies (replay / record)')
+    parser.add_argument('--cassette', default=None, help='recorded Earth Engine getInfo payloads (JSON lines), replayed with one worker')
+    parser.add_argument('--ee-modes', nargs='+', default=['json', 'table', 'chip'])
+    parser.add_argument('--gfs-max-lead', type=int, default=120, help='last synthetic GFS forecast hour')
+    run(parser.parse_args())
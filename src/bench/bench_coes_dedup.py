@@ -0,0 +1,60 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/bench_coes_dedup.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# Dedup benchmark: groupby-apply drop_duplicates vs dedupLatest.
+#   python bench_coes_dedup.py --equipment 100 1000 3000 --days 365 730
+#-----------------------------------------------------
+#-- Modules --#
+import time
+import argparse
+import pandas as pd
+from synthetic import makeMediciones
+from client_coes import dedupLatest
+
+def makeBatches(nEquipment, nDays, nCodes=4, overlap=0.3):
+    """
+    One frame per lectcodi; each code repeats `overlap` of the base rows with
+    the power shifted by `code`, so only keep='last' matches the reference.
+    """
+    base = makeMediciones(nEquipment=nEquipment, nDays=nDays)
+    power = [f'h{i}' for i in range(1, 49)]
+    batches = [base]
+    for code in range(1, nCodes):
+        batch = base.sample(frac=overlap, random_state=code)
+        batch[power] = batch[power] + code
+        batches.append(batch)
+    return pd.concat(batches, ignore_index=False)
+
+def groupbyApply(dataset):
+    out = dataset.groupby("NombreEquipo", group_keys=True)\
+                 .apply(lambda x: x.drop_duplicates(subset=['Medifecha'], keep='last'))
+    #-- pandas >= 3 leaves the group key only in the index --#
+    return out.reset_index(level=0, drop='NombreEquipo' in out.columns)
+
+def _timed(fn, frame):
+    tic = time.perf_counter()
+    out = fn(frame)
+    return time.perf_counter() - tic, out
+
+def run(equipment, days):
+    print(f"{'equip':>6} {'days':>5} {'rows in':>9} {'rows out':>9} {'groupby [s]':>12} {'vector [s]':>11} {'speedup':>8}")
+    for nEquipment in equipment:
+        for nDays in days:
+            frame = makeBatches(nEquipment, nDays)
+            tApply, ref = _timed(groupbyApply, frame)
+            tVector, out = _timed(dedupLatest, frame)
+            ref = ref.reset_index(drop=True).sort_values(['NombreEquipo', 'Medifecha']).reset_index(drop=True)
+            pd.testing.assert_frame_equal(ref, out[ref.columns])
+            print(f"{nEquipment:>6} {nDays:>5} {len(frame):>9} {len(out):>9} "
+                  f"{tApply:>12.3f} {tVector:>11.3f} {tApply / tVector:>7.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='COES dedup benchmark')
+    parser.add_argument('--equipment', type=int, nargs='+', default=[100, 1000, 3000])
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 730])
+    cli = parser.parse_args()
+    run(cli.equipment, cli.days)
@@ -0,0 +1,43 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/bench_coes_reshape.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# Reshape benchmark for getFormatData: melt reference vs NumPy engine.
+#   python bench_coes_reshape.py --years 1 3 5
+#-----------------------------------------------------
+#-- Modules --#
+import time
+import argparse
+import pandas as pd
+from synthetic import makeMediciones
+from client_coes import _meltHalfHours, _reshapeHalfHours
+
+def _best(fn, frame, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        tic = time.perf_counter()
+        out = fn(frame)
+        best = min(best, time.perf_counter() - tic)
+    return best, out
+
+def run(years, nEquipment, repeat):
+    print(f"{'years':>5} {'rows in':>9} {'rows out':>10} {'melt [s]':>9} {'numpy [s]':>10} {'speedup':>8}")
+    for y in years:
+        frame = makeMediciones(nEquipment=nEquipment, nDays=int(365 * y))
+        frame = frame.drop(['TensionEquipo', 'CodigoUbicacion', 'NombreUbicacion', '$id'], axis=1)
+        tMelt, ref = _best(_meltHalfHours, frame, repeat)
+        tNumpy, out = _best(_reshapeHalfHours, frame, repeat)
+        pd.testing.assert_frame_equal(ref.reset_index(drop=True), out[ref.columns],
+                                      check_dtype=False)
+        print(f"{y:>5} {len(frame):>9} {len(out):>10} {tMelt:>9.3f} {tNumpy:>10.3f} {tMelt / tNumpy:>7.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='getFormatData reshape benchmark')
+    parser.add_argument('--years', type=float, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--equipment', type=int, default=11)
+    parser.add_argument('--repeat', type=int, default=3)
+    cli = parser.parse_args()
+    run(cli.years, cli.equipment, cli.repeat)
@@ -0,0 +1,409 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/ee_shim.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# Offline stand-in for the Earth Engine API surface used by
+# client_eeforecast. Objects are evaluated eagerly on synthetic GFS/IFS
+# collections; getInfo() returns recorded payloads when a cassette is loaded.
+#   import ee_shim; ee_shim.install(server=ReplayServer().start())
+#   import client_eeforecast   # now talks to the shim
+#-----------------------------------------------------
+#-- Modules --#
+import io
+import sys
+import json
+import datetime
+import numpy as np
+import pandas as pd
+
+GFS_ID = 'NOAA/GFS0P25'
+IFS_ID = 'ECMWF/NRT_FORECAST/IFS/OPER'
+STATE = {'server': None, 'cassette': None, 'days': 8, 'gfs_max_lead': 384, 'now': None}
+_CATALOG = {}
+
+#-- Recorded payloads --#
+class Cassette:
+    """
+    getInfo payloads in call order. Record with a live `ee` by wrapping
+    client_eeforecast.get_info with `recorder`, replay by loading the file
+    and passing it to install().
+
+    Payloads are not keyed by request, so replay must issue the calls in the
+    recorded order: run extractions with a single worker. computePixels and
+    table downloads are not recorded; they are always served synthetically.
+    """
+
+    def __init__(self, payloads=None):
+        self.payloads = list(payloads or [])
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for p in self.payloads:
+                f.write(json.dumps(p, separators=(',', ':')) + '\n')
+
+    def recorder(self, get_info):
+        def _record(obj):
+            result = get_info(obj)
+            self.payloads.append(result)
+            return result
+        return _record
+
+    def next(self):
+        return self.payloads.pop(0) if self.payloads else None
+
+def _info(value):
+    if isinstance(value, (Feature, FeatureCollection, List, Dictionary)):
+        return value.getInfo()
+    if isinstance(value, (list, tuple)):
+        return [_info(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class _Computed:
+    def __init__(self, value):
+        self.value = value
+
+    def getInfo(self):
+        cassette = STATE['cassette']
+        recorded = cassette.next() if cassette is not None else None
+        return recorded if recorded is not None else _info(self.value)
+
+def _unwrap(value):
+    return value.value if isinstance(value, _Computed) else value
+
+#-- Scalars and containers --#
+def _millis(value) -> int:
+    value = _unwrap(value)
+    if isinstance(value, Date):
+        return value.ms
+    if isinstance(value, str):
+        return int(pd.Timestamp(value, tz='UTC').value // 10**6)
+    if isinstance(value, datetime.datetime):
+        return int(pd.Timestamp(value).tz_localize('UTC').value // 10**6)
+    return int(value)
+
+class Date:
+    def __init__(self, value):
+        self.ms = _millis(value)
+
+    def millis(self) -> int:
+        return self.ms
+
+def Number(value):
+    return _unwrap(value)
+
+def String(value):
+    return _unwrap(value)
+
+class List(_Computed):
+    def __init__(self, values):
+        super().__init__([_unwrap(v) for v in _unwrap(values)])
+
+    def distinct(self):
+        return List(list(dict.fromkeys(self.value)))
+
+    def sort(self):
+        return List(sorted(self.value))
+
+    def contains(self, item):
+        return item in self.value
+
+    def size(self):
+        return _Computed(len(self.value))
+
+class Dictionary(_Computed):
+    def get(self, key):
+        value = self.value[key]
+        return List(value) if isinstance(value, list) else _Computed(value)
+
+class Algorithms:
+    @staticmethod
+    def If(condition, true_case, false_case):
+        return true_case if _unwrap(condition) else false_case
+
+#-- Filters and reducers --#
+class Filter:
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def __call__(self, props: dict) -> bool:
+        return self.predicate(props)
+
+    @staticmethod
+    def eq(name, value):
+        value = _unwrap(value)
+        return Filter(lambda p: p.get(name) == value)
+
+    @staticmethod
+    def inList(name, values):
+        values = set(_unwrap(values))
+        return Filter(lambda p: p.get(name) in values)
+
+    @staticmethod
+    def rangeContains(name, low, high):
+        low, high = _unwrap(low), _unwrap(high)
+        return Filter(lambda p: p.get(name) is not None and low <= p[name] <= high)
+
+    @staticmethod
+    def date(start, end=None):
+        start = _millis(start)
+        end = _millis(end) if end is not None else start + 86400000
+        return Filter(lambda p: start <= p['system:time_start'] < end)
+
+    @staticmethod
+    def calendarRange(start, end, field='day_of_year'):
+        assert field == 'hour', 'only hour ranges are used by the clients'
+        return Filter(lambda p: start <= (p['system:time_start'] // 3600000) % 24 <= end)
+
+    @staticmethod
+    def Or(*filters):
+        return Filter(lambda p: any(f(p) for f in filters))
+
+    @staticmethod
+    def And(*filters):
+        return Filter(lambda p: all(f(p) for f in filters))
+
+class Reducer:
+    @staticmethod
+    def mean():
+        return 'mean'
+
+    @staticmethod
+    def toList(tupleSize=None):
+        return ('toList', tupleSize)
+
+#-- Geometry and features --#
+class Geometry:
+    @staticmethod
+    def Point(coords):
+        return {'type': 'Point', 'coordinates': [float(c) for c in coords]}
+
+class Feature:
+    def __init__(self, geometry, props=None):
+        self.geometry = geometry
+        self.props = dict(props or {})
+
+    def get(self, key):
+        return self.props.get(key)
+
+    def set(self, *args):
+        update = args[0] if len(args) == 1 else {args[0]: args[1]}
+        return Feature(self.geometry, {**self.props, **{k: _unwrap(v) for k, v in update.items()}})
+
+    def getInfo(self):
+        return {'type': 'Feature', 'geometry': self.geometry, 'properties': _info(self.props)}
+
+#-- Images --#
+class Image:
+    """
+    Bands are functions of (lon, lat) arrays, so any point or grid can be sampled.
+    """
+
+    def __init__(self, props: dict, bands: dict):
+        self.props = props
+        self.bands = bands
+
+    def get(self, key):
+        return self.props.get(key)
+
+    def set(self, *args):
+        update = args[0] if len(args) == 1 else {args[0]: args[1]}
+        return Image({**self.props, **{k: _unwrap(v) for k, v in update.items()}}, self.bands)
+
+    def propertyNames(self):
+        return List(list(self.props))
+
+    def select(self, names, newNames=None):
+        names = [names] if isinstance(names, str) else list(names)
+        newNames = names if newNames is None else list(newNames)
+        return Image(self.props, {new: self.bands[old] for old, new in zip(names, newNames)})
+
+    def addBands(self, other):
+        return Image(self.props, {**self.bands, **other.bands})
+
+    def rename(self, *names):
+        names = list(names[0]) if len(names) == 1 and not isinstance(names[0], str) else list(names)
+        return Image(self.props, dict(zip(names, self.bands.values())))
+
+    def copyProperties(self, source, properties=None):
+        keys = properties or list(source.props)
+        return Image({**self.props, **{k: source.props[k] for k in keys if k in source.props}}, self.bands)
+
+    def reduceRegions(self, collection, reducer, scale=None):
+        feats = collection.elements
+        lon = np.array([f.geometry['coordinates'][0] for f in feats])
+        lat = np.array([f.geometry['coordinates'][1] for f in feats])
+        values = {b: fn(lon, lat) for b, fn in self.bands.items()}
+        return FeatureCollection([f.set({b: float(v[k]) for b, v in values.items()})
+                                  for k, f in enumerate(feats)])
+
+#-- Collections --#
+class _Collection:
+    def __init__(self, elements):
+        self.elements = list(elements)
+
+    def _like(self, elements):
+        if elements and all(isinstance(e, Image) for e in elements):
+            return ImageCollection(elements)
+        return FeatureCollection(elements) if isinstance(self, FeatureCollection) else ImageCollection(elements)
+
+    def filter(self, flt):
+        return self._like([e for e in self.elements if flt(e.props)])
+
+    def filterDate(self, start, end=None):
+        return self.filter(Filter.date(start, end))
+
+    def map(self, fn):
+        return self._like([fn(e) for e in self.elements])
+
+    def select(self, *args):
+        return self.map(lambda e: e.select(*args))
+
+    def size(self):
+        return _Computed(len(self.elements))
+
+    def aggregate_array(self, prop):
+        return List([e.props[prop] for e in self.elements if prop in e.props])
+
+    def reduceColumns(self, reducer, selectors):
+        rows = [[e.props.get(s) for s in selectors] for e in self.elements
+                if all(e.props.get(s) is not None for s in selectors)]
+        if reducer[1] in (None, 1) and len(selectors) == 1:
+            rows = [r[0] for r in rows]
+        return Dictionary({'list': rows})
+
+    def toList(self, count, offset=0):
+        return List(self.elements[offset:offset + count])
+
+    def flatten(self):
+        return FeatureCollection([f for fc in self.elements for f in fc.elements])
+
+class ImageCollection(_Collection):
+    def __init__(self, source):
+        super().__init__(_catalog(source) if isinstance(source, str) else _unwrap(source))
+
+    def toBands(self):
+        bands = {}
+        for img in self.elements:
+            for b, fn in img.bands.items():
+                bands[f"{img.props['system:index']}_{b}"] = fn
+        return Image({}, bands)
+
+class FeatureCollection(_Collection):
+    def __init__(self, source):
+        source = _unwrap(source)
+        super().__init__(source.elements if isinstance(source, _Collection) else
+                         [e if isinstance(e, Feature) else Feature(None, e) for e in source])
+
+    def getInfo(self):
+        cassette = STATE['cassette']
+        recorded = cassette.next() if cassette is not None else None
+        if recorded is not None:
+            return recorded
+        return {'type': 'FeatureCollection', 'features': [f.getInfo() for f in self.elements]}
+
+    def getDownloadURL(self, filetype='CSV', selectors=None, filename=None):
+        assert filetype.upper() == 'CSV', 'only CSV downloads are used by the clients'
+        frame = pd.DataFrame([{s: f.props.get(s) for s in selectors} for f in self.elements],
+                             columns=list(selectors))
+        body = io.StringIO()
+        frame.insert(0, 'system:index', [str(i) for i in range(len(frame))])
+        frame.to_csv(body, index=False)
+        return STATE['server'].register_table(body.getvalue().encode('utf-8'))
+
+#-- Pixels --#
+def computePixels(params: dict) -> np.ndarray:
+    image, grid = params['expression'], params['grid']
+    t = grid['affineTransform']
+    width, height = grid['dimensions']['width'], grid['dimensions']['height']
+    lon = t['translateX'] + (np.arange(width) + 0.5) * t['scaleX']
+    lat = t['translateY'] + (np.arange(height) + 0.5) * t['scaleY']
+    lon, lat = np.meshgrid(lon, lat)
+    out = np.zeros((height, width), dtype=[(b, 'f4') for b in image.bands])
+    for b, fn in image.bands.items():
+        out[b] = fn(lon, lat)
+    return out
+
+class data:
+    computePixels = staticmethod(computePixels)
+
+def Initialize(*args, **kwargs):
+    pass
+
+#-- Synthetic catalog --#
+def _field(kind: str, valid_ms: int, level: float = 10.0):
+    """
+    Smooth deterministic field of (lon, lat) for one valid time.
+    """
+    hours = valid_ms / 3600000
+    phase = {'u': 0.0, 'v': 1.3, 't': 2.1}[kind]
+    shear = (level / 10.0) ** 0.14
+
+    def fn(lon, lat):
+        wave = np.sin(0.35 * lon + 0.2 * lat + 2 * np.pi * hours / 24 + phase)
+        if kind == 't':
+            return 290 + 5 * wave + 0.1 * lat
+        return shear * (4 + 3 * wave + 0.05 * lon)
+    return fn
+
+def _runs(now_ms: int, days: int):
+    first = (now_ms - days * 86400000) // 21600000 * 21600000
+    return range(first, now_ms - 4 * 3600000, 21600000)
+
+def _catalog(collection_id: str):
+    now = STATE['now'] or int(pd.Timestamp.now(tz='UTC').floor('h').value // 10**6)
+    key = (collection_id, now, STATE['days'], STATE['gfs_max_lead'])
+    if key in _CATALOG:
+        return _CATALOG[key]
+    images = []
+    for init in _runs(now, STATE['days']):
+        stamp = pd.Timestamp(init, unit='ms', tz='UTC').strftime('%Y%m%d%H')
+        if collection_id == GFS_ID:
+            leads = [h for h in range(0, STATE['gfs_max_lead'] + 1) if h <= 120 or h % 3 == 0]
+            for h in leads:
+                valid = init + h * 3600000
+                images.append(Image(
+                    {'creation_time': init, 'forecast_time': valid, 'forecast_hours': h,
+                     'system:time_start': init, 'system:index': f'{stamp}F{h:03d}'},
+                    {'u_component_of_wind_10m_above_ground': _field('u', valid),
+                     'v_component_of_wind_10m_above_ground': _field('v', valid),
+                     'temperature_2m_above_ground': _field('t', valid)}))
+        elif collection_id == IFS_ID:
+            last = 144 if stamp.endswith(('00', '12')) else 90
+            for h in range(0, last + 1, 3):
+                valid = init + h * 3600000
+                images.append(Image(
+                    {'creation_time': init, 'system:time_start': valid, 'system:index': f'{stamp}_{h:03d}'},
+                    {'u_component_of_wind_10m_sfc': _field('u', valid),
+                     'v_component_of_wind_10m_sfc': _field('v', valid),
+                     'u_component_of_wind_100m_sfc': _field('u', valid, 100),
+                     'v_component_of_wind_100m_sfc': _field('v', valid, 100),
+                     'temperature_2m_sfc': _field('t', valid)}))
+        else:
+            raise ValueError(f'No synthetic collection for {collection_id}')
+    _CATALOG[key] = images
+    return images
+
+def install(server=None, cassette: Cassette = None, days: int = 8, gfs_max_lead: int = 384, now=None):
+    """
+    Register this module as `ee` (before client_eeforecast is imported).
+
+    :param server: ReplayServer serving getDownloadURL tables
+    :param cassette: recorded getInfo payloads replayed in call order
+    :param days: days of synthetic runs before `now`
+    :param gfs_max_lead: last synthetic GFS forecast hour
+    :param now: epoch ms anchoring the synthetic catalog (default: current hour)
+    """
+    STATE.update(server=server, cassette=cassette, days=days, gfs_max_lead=gfs_max_lead,
+                 now=None if now is None else _millis(now))
+    sys.modules['ee'] = sys.modules[__name__]
+    return sys.modules[__name__]
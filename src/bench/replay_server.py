@@ -0,0 +1,199 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/replay_server.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# Local stand-in for api/Mediciones (COES), the Open-Meteo archive API and
+# Earth Engine table downloads. Responses are replayed from a recording
+# directory when present, otherwise generated deterministically.
+#   python replay_server.py --port 8765 --latency 0.2 --record-dir ./cassettes --mode record
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import datetime
+import threading
+import urllib.parse
+import numpy as np
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from synthetic import COES_EQUIPMENT
+
+UPSTREAMS = {
+    'coes': 'https://appserver.coes.org.pe/waMediciones/',
+    'openmeteo': 'https://archive-api.open-meteo.com/',
+}
+
+#-- Synthetic payloads --#
+def _seed(*parts) -> int:
+    return int.from_bytes(hashlib.sha256("\x1f".join(map(str, parts)).encode()).digest()[:8], 'little')
+
+def syntheticMediciones(code: int, fechaIni: str, fechaFin: str, nEquipment: int = None) -> bytes:
+    """
+    api/Mediciones body: one row per equipment and day with the id columns,
+    h1..h48 and 48 trailing columns (dropped by clientCoes).
+    """
+    names = COES_EQUIPMENT if nEquipment is None else \
+        (COES_EQUIPMENT + [f'C.E. SYNTH {i:04d}' for i in range(nEquipment)])[:nEquipment]
+    days = np.arange(np.datetime64(fechaIni), np.datetime64(fechaFin) + 1)
+    rng = np.random.default_rng(_seed('coes', code, fechaIni, fechaFin))
+    power = np.round(rng.gamma(2.0, 10.0, size=(len(names) * len(days), 48)), 3)
+    rows, k = [], 0
+    for name in names:
+        for day in days:
+            row = {'$id': str(k + 1), 'NombreEmpresa': 'EMPRESA', 'NombreEquipo': name,
+                   'Tipoinfoabrev': 'MW', 'Medifecha': f'{day}T00:00:00', 'TensionEquipo': '',
+                   'CodigoUbicacion': 0, 'NombreUbicacion': ''}
+            row.update({f'h{w}': v for w, v in enumerate(power[k].tolist(), start=1)})
+            row.update({f'T{w}': None for w in range(1, 49)})
+            rows.append(row)
+            k += 1
+    return json.dumps(rows).encode('utf-8')
+
+def syntheticArchive(query: dict) -> bytes:
+    """
+    Open-Meteo archive body for one or several comma-joined locations, with
+    unixtime or ISO time axes and deterministic values per (point, variable, hour).
+    """
+    lats = query['latitude'][0].split(',')
+    lons = query['longitude'][0].split(',')
+    start = datetime.date.fromisoformat(query['start_date'][0])
+    end = datetime.date.fromisoformat(query['end_date'][0])
+    variables = query['hourly'][0].split(',')
+    offset = -5 * 3600 if query.get('timezone', ['UTC'])[0] == 'America/Lima' else 0
+    hours = ((end - start).days + 1) * 24
+    t0 = int(datetime.datetime(start.year, start.month, start.day, tzinfo=datetime.timezone.utc).timestamp()) - offset
+    unixtime = query.get('timeformat', ['iso8601'])[0] == 'unixtime'
+    epoch = t0 + 3600 * np.arange(hours)
+    if unixtime:
+        times = epoch.tolist()
+    else:
+        times = [datetime.datetime.fromtimestamp(int(t) + offset, datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M') for t in epoch]
+    out = []
+    for lat, lon in zip(lats, lons):
+        hourly = {'time': times}
+        for v in variables:
+            phase = (_seed(lat, lon, v) % 1000) / 1000 * 2 * np.pi
+            base = 360 if 'direction' in v else 8
+            hourly[v] = np.round(base / 2 * (1 + np.sin(2 * np.pi * epoch / 86400 + phase)), 2).tolist()
+        out.append({'latitude': float(lat), 'longitude': float(lon), 'utc_offset_seconds': offset,
+                    'hourly': hourly})
+    return json.dumps(out if len(out) > 1 else out[0]).encode('utf-8')
+
+#-- Server --#
+class ReplayServer:
+    """
+    Threaded HTTP stand-in. `mode` is 'synthetic' (generate), 'replay'
+    (recorded bodies, synthetic fallback) or 'record' (forward upstream and
+    save the bodies under `record_dir`).
+    """
+
+    def __init__(self, port: int = 0, latency: float = 0.0, mode: str = 'synthetic',
+                 record_dir: str = None, nEquipment: int = None):
+        self.latency = latency
+        self.mode = mode
+        self.record_dir = record_dir
+        self.nEquipment = nEquipment
+        self.tables = {}
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        if record_dir:
+            os.makedirs(record_dir, exist_ok=True)
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def register_table(self, body: bytes) -> str:
+        """
+        Serve `body` once under a fresh /ee/table/ URL (Earth Engine downloads).
+        """
+        token = uuid.uuid4().hex
+        with self._lock:
+            self.tables[token] = body
+        return f'{self.url}ee/table/{token}'
+
+    def _recordPath(self, path: str) -> str:
+        return os.path.join(self.record_dir, hashlib.sha256(path.encode('utf-8')).hexdigest() + '.json')
+
+    def _body(self, path: str):
+        parsed = urllib.parse.urlparse(path)
+        query = urllib.parse.parse_qs(parsed.query)
+        if parsed.path.startswith('/ee/table/'):
+            with self._lock:
+                return self.tables.pop(parsed.path.rsplit('/', 1)[-1], None), 'text/csv'
+        if self.record_dir and self.mode in ('replay', 'record'):
+            recorded = self._recordPath(path)
+            if os.path.exists(recorded):
+                with open(recorded, 'rb') as f:
+                    return f.read(), 'application/json'
+            if self.mode == 'record':
+                upstream = UPSTREAMS['coes'] if 'Mediciones' in parsed.path else UPSTREAMS['openmeteo']
+                r = requests.get(urllib.parse.urljoin(upstream, path.lstrip('/')), timeout=300)
+                r.raise_for_status()
+                with open(recorded, 'wb') as f:
+                    f.write(r.content)
+                return r.content, 'application/json'
+        if parsed.path.endswith('api/Mediciones'):
+            return syntheticMediciones(int(query['lectcodi'][0]), query['fechaIni'][0],
+                                       query['fechaFin'][0], self.nEquipment), 'application/json'
+        if parsed.path.startswith('/v1/'):
+            return syntheticArchive(query), 'application/json'
+        return None, None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                body, contentType = server._body(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', contentType)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='COES / Open-Meteo replay server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--mode', choices=['synthetic', 'replay', 'record'], default='synthetic')
+    parser.add_argument('--record-dir', default=None)
+    cli = parser.parse_args()
+    server = ReplayServer(cli.port, cli.latency, cli.mode, cli.record_dir).start()
+    print(f'Serving on {server.url} ({cli.mode})')
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
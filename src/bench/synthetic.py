@@ -0,0 +1,54 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/bench/synthetic.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import sys
+import numpy as np
+import pandas as pd
+#-- Make src/data importable from the benchmarks --#
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+#-- COES equipment names as published by api/Mediciones --#
+COES_EQUIPMENT = [
+    'C.E. CUPISNIQUE', 'C.E. DUNA', 'C.E. HUAMBOS', 'C.E. MARCONA',
+    'C.E. PUNTA LOMITAS', 'C.E. PUNTA LOMITAS EXPANSION', 'C.E. SAN JUAN',
+    'C.E. TALARA', 'C.E. TRES HERMANAS', 'C.E. WAYRA EXTENSION', 'C.E. WAYRA I',
+]
+
+def equipmentNames(nEquipment: int):
+    """
+    Real wind-farm equipment first, then synthetic 'C.E. SYNTH nnnn' names.
+    """
+    names = COES_EQUIPMENT[:nEquipment]
+    names += [f'C.E. SYNTH {i:04d}' for i in range(nEquipment - len(names))]
+    return names
+
+def makeMediciones(nEquipment: int = 11, nDays: int = 365, start: str = '2023-01-01',
+                   seed: int = 0) -> pd.DataFrame:
+    """
+    Wide COES frame shaped like clientCoes output: one row per equipment and
+    day with the id columns followed by h1..h48.
+    """
+    rng = np.random.default_rng(seed)
+    names = equipmentNames(nEquipment)
+    days = pd.date_range(start, periods=nDays, freq='D').strftime('%Y-%m-%dT00:00:00')
+    frame = pd.DataFrame({
+        '$id': np.arange(nEquipment * nDays).astype(str),
+        'NombreEmpresa': 'EMPRESA',
+        'NombreEquipo': np.repeat(names, nDays),
+        'Tipoinfoabrev': 'MW',
+        'Medifecha': np.tile(days, nEquipment),
+        'TensionEquipo': '',
+        'CodigoUbicacion': 0,
+        'NombreUbicacion': '',
+    })
+    power = pd.DataFrame(rng.gamma(2.0, 10.0, size=(len(frame), 48)),
+                         columns=[f'h{w}' for w in range(1, 49)])
+    return pd.concat([frame, power], axis=1)
@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/backfill_coes.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+# Resumable historical backfill of COES generation:
+#   python backfill_coes.py --start 2023-01-01 --end 2025-09-30 --chunk month --workers 4
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import json
+import time
+import argparse
+import datetime
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from client_coes import (logger, buildSession, clientCoes, prepareDataset,
+                         upsertGeneration, writeEquipmentReview)
+from http_cache import ResponseCache
+
+#-- Chunking --#
+def splitRange(startDate: datetime.date, endDate: datetime.date, chunk='month'):
+    """
+    Split [startDate, endDate] into inclusive (start, end) day or month chunks.
+    """
+    chunks = []
+    current = startDate
+    while current <= endDate:
+        if chunk == 'day':
+            last = current
+        else:
+            nextMonth = (current.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+            last = min(nextMonth - datetime.timedelta(days=1), endDate)
+        chunks.append((current, last))
+        current = last + datetime.timedelta(days=1)
+    return chunks
+
+def chunkId(chunk) -> str:
+    return f"{chunk[0].isoformat()}_{chunk[1].isoformat()}"
+
+#-- Checkpoint --#
+def loadCheckpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return set(json.load(f).get('completed', []))
+
+def saveCheckpoint(completed: set, path: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'completed': sorted(completed)}, f, indent=2)
+    os.replace(tmp_path, path)
+
+#-- Backfill --#
+def fetchChunk(chunk, codes, service, session, timeout=120, cache=None):
+    """
+    Fetch every code for one chunk and return it formatted. Any failed request
+    raises, so the chunk is not checkpointed and will be retried on resume.
+    """
+    startDate, endDate = chunk
+    tic = time.perf_counter()
+    container = []
+    for code in codes:
+        result = clientCoes(code, service, startDate, endDate, session=session,
+                            timeout=timeout, stream=True, raiseErrors=True, cache=cache)
+        if not result.empty:
+            container.append(result)
+    data = prepareDataset(pd.concat(container, ignore_index=True)) if container else pd.DataFrame()
+    logger.info(f"Chunk {chunkId(chunk)}: {len(data)} rows in {time.perf_counter() - tic:.2f}s")
+    return data
+
+def backfill(startDate, endDate, service, storePath, checkpointPath, *args,
+             codes=range(0, 4), chunk='month', maxWorkers=4, timeout=120, cache=None, **kwargs):
+    """
+    Run the pending chunks of [startDate, endDate] with at most `maxWorkers`
+    in flight. Each finished chunk is upserted into the store and checkpointed
+    from this thread, so store writes never race and a rerun skips done chunks.
+    """
+    completed = loadCheckpoint(checkpointPath)
+    pending = [c for c in splitRange(startDate, endDate, chunk) if chunkId(c) not in completed]
+    logger.info(f"Backfill {startDate} -> {endDate}: {len(pending)} pending chunks, {len(completed)} already done")
+    session = buildSession(poolSize=maxWorkers)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = {executor.submit(fetchChunk, c, list(codes), service, session, timeout, cache): c
+                   for c in pending}
+        for future in as_completed(futures):
+            c = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Chunk {chunkId(c)} failed and will be retried on resume: {e}")
+                continue
+            if not data.empty:
+                upsertGeneration(data, storePath)
+            completed.add(chunkId(c))
+            saveCheckpoint(completed, checkpointPath)
+    session.close()
+    logger.info(f"Backfill finished: {len(pending) - failed} chunks done, {failed} failed")
+    if cache is not None:
+        logger.info(cache.summary())
+    return failed
+
+#-- Run code --#
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resumable COES generation backfill')
+    parser.add_argument('--start', required=True, type=datetime.date.fromisoformat)
+    parser.add_argument('--end', default=datetime.date.today(), type=datetime.date.fromisoformat)
+    parser.add_argument('--chunk', choices=['day', 'month'], default='month')
+    parser.add_argument('--workers', type=int, default=4, help='maximum chunks in flight')
+    parser.add_argument('--store', default='../dataset/generation')
+    parser.add_argument('--checkpoint', default=None,
+                        help='defaults to <store>/_backfill.json')
+    parser.add_argument('--cache', default='../dataset/.httpCache',
+                        help='on-disk api/Mediciones response cache')
+    parser.add_argument('--no-cache', action='store_true', help='always hit api/Mediciones')
+    cli = parser.parse_args()
+    service = 'https://appserver.coes.org.pe/waMediciones/'
+    checkpoint = cli.checkpoint or os.path.join(cli.store, '_backfill.json')
+    failed = backfill(cli.start, cli.end, service, cli.store, checkpoint,
+                      chunk=cli.chunk, maxWorkers=cli.workers,
+                      cache=None if cli.no_cache else ResponseCache(cli.cache))
+    writeEquipmentReview('../dataset/unknownEquipment.csv')
+    raise SystemExit(1 if failed else 0)
@@ -7,12 +7,27 @@
 # @Created Date: Tuesday, Sept 09th 2025, 9:21:10 am
 #-----------------------------------------------------
 #-- Modules --#
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests
 import datetime
 import logging
 import warnings
 import os
+import re
+import json
+import codecs
+import time
+import argparse
+import threading
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from parquet_store import atomic_write_parquet, upsert_partitions, read_partitions
+from http_cache import ResponseCache
 warnings.filterwarnings('ignore')
 #-- logging --#
 logging.basicConfig(
@@ -24,75 +39,518 @@ logging.basicConfig(
     ]
 )
 logger = logging.getLogger(__name__)
+#-- Half-hour layout of the COES wide rows: h1..h48 end at 00:30 .. 24:00 --#
+HALF_HOURS = [f'h{w}' for w in range(1, 49)]
+#-- currentGen.parquet schema; bump GEN_SCHEMA_VERSION on any change --#
+GEN_SCHEMA_VERSION = '1'
+GEN_TIMEZONE = 'America/Lima'
+GEN_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ms', tz=GEN_TIMEZONE)),
+    ('NombreEmpresa', pa.dictionary(pa.int16(), pa.string())),
+    ('Tipoinfoabrev', pa.dictionary(pa.int16(), pa.string())),
+    ('power', pa.float32()),
+    ('name', pa.dictionary(pa.int16(), pa.string())),
+], metadata={b'gen_schema_version': GEN_SCHEMA_VERSION.encode()})
+#-- Equipment resolution --#
+WIND_PATTERN = re.compile('Cupis|Dunas|Huambos|Marcona|Lomitas|Talara|Hermanas|Wayra|C.E.', re.IGNORECASE)
+NOT_WIND_PATTERN = re.compile('TV|C.H.|C.S.', re.IGNORECASE)
+#-- (pattern, farm) rules checked in order; farm None drops the equipment --#
+EQUIPMENT_RULES = [
+    (re.compile('PUN', re.IGNORECASE), 'W.F. Punta Lomitas'),
+    (re.compile('paita', re.IGNORECASE), None),
+]
+EQUIPMENT_FARMS = {
+    'C.E. CUPISNIQUE':'W.F. Cupisnique',
+    'C.E. DUNA':'W.F. Duna',
+    'C.E. HUAMBOS':'W.F. Huambos',
+    'C.E. MARCONA':'W.F. Marcona',
+    'C.E. SAN JUAN':'W.F. San Juan',
+    'C.E. TALARA':'W.F. Talara',
+    'C.E. TRES HERMANAS':'W.F. Tres Hermanas',
+    'C.E. WAYRA EXTENSION':'W.F. Wayra Ext',
+    'C.E. WAYRA I':'W.F. Wayra I'
+}
+#-- Farms reported by COES as several units whose power is summed --#
+AGGREGATED_FARMS = ['W.F. Punta Lomitas']
+FARMS = sorted(set(EQUIPMENT_FARMS.values()) | set(AGGREGATED_FARMS))
+#-- Wind-like equipment that no rule resolves: {NombreEquipo: {lectcodi}} --#
+UNKNOWN_EQUIPMENT = {}
+_unknownLock = threading.Lock()
 #-- Main code --#
+@lru_cache(maxsize=None)
+def resolveEquipment(nombreEquipo: str):
+    """
+    Map one NombreEquipo to (farm, status) with status 'farm', 'drop' or 'unknown'.
+    Memoized, so the patterns run once per distinct equipment name.
+    """
+    if not WIND_PATTERN.search(nombreEquipo) or NOT_WIND_PATTERN.search(nombreEquipo):
+        return None, 'drop'
+    for pattern, farm in EQUIPMENT_RULES:
+        if pattern.search(nombreEquipo):
+            return farm, 'farm' if farm else 'drop'
+    farm = EQUIPMENT_FARMS.get(nombreEquipo)
+    return farm, 'farm' if farm else 'unknown'
+
+def _recordUnknown(nombreEquipo: str, code=None):
+    with _unknownLock:
+        codes = UNKNOWN_EQUIPMENT.setdefault(nombreEquipo, set())
+        if code is not None:
+            codes.add(code)
+
+def mapEquipment(nombreEquipo: pd.Series, code=None) -> pd.Categorical:
+    """
+    Resolve every distinct equipment name once and broadcast the result as a
+    categorical over FARMS; dropped and unknown equipment become NaN.
+    Unknown names are recorded in UNKNOWN_EQUIPMENT for review.
+    """
+    equipment = pd.Categorical(nombreEquipo)
+    lookup = np.full(len(equipment.categories) + 1, -1, dtype='int16')
+    for i, name in enumerate(equipment.categories):
+        farm, status = resolveEquipment(name)
+        if status == 'farm':
+            lookup[i] = FARMS.index(farm)
+        elif status == 'unknown':
+            _recordUnknown(name, code)
+    #-- code -1 (missing name) picks the trailing -1 --#
+    return pd.Categorical.from_codes(lookup[equipment.codes], categories=FARMS)
+
+def writeEquipmentReview(path: str):
+    """
+    Write the unknown equipment seen in this run to a CSV review report.
+    """
+    if not UNKNOWN_EQUIPMENT:
+        return
+    report = pd.DataFrame({
+        'NombreEquipo': list(UNKNOWN_EQUIPMENT),
+        'lectcodi': [','.join(str(c) for c in sorted(v)) for v in UNKNOWN_EQUIPMENT.values()],
+    })
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    report.to_csv(path, index=False)
+    logger.warning(f"{len(report)} unknown wind equipment names were dropped; review {path}")
+
+def buildSession(poolSize: int = 4) -> requests.Session:
+    """
+    Keep-alive session whose connection pool is sized for `poolSize` workers.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+#-- Streaming decode --#
+_JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+def _iterJsonArray(chunks):
+    """
+    Yield the items of a top-level JSON array from an iterable of byte chunks,
+    holding at most one chunk plus one partial item in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, opened = '', 0, False
+    for chunk in chunks:
+        buffer = buffer[pos:] + utf8.decode(chunk)
+        pos = 0
+        while True:
+            pos = _JSON_SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if not opened:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array from api/Mediciones")
+                opened, pos = True, pos + 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # item continues in the next chunk
+            yield item
+    raise ValueError("Truncated JSON array from api/Mediciones")
+
+class _ColumnBuffers:
+    """
+    Preallocated column storage for streamed COES rows: id columns in lists,
+    h1..h48 in a float64 block that doubles when full.
+    """
+    def __init__(self, columns, capacity=1024):
+        self.columns = list(columns)
+        self.hCols = [c for c in self.columns if c in HALF_HOURS]
+        self.ids = {c: [] for c in self.columns if c not in self.hCols}
+        self.values = np.empty((capacity, len(self.hCols)), dtype='float64')
+        self.size = 0
+
+    def append(self, row: dict):
+        if self.size == len(self.values):
+            self.values = np.concatenate([self.values, np.empty_like(self.values)])
+        self.values[self.size] = [row.get(c) for c in self.hCols]
+        for c, values in self.ids.items():
+            values.append(row.get(c))
+        self.size += 1
+
+    def frame(self) -> pd.DataFrame:
+        data = dict(self.ids)
+        data.update(zip(self.hCols, self.values[:self.size].T))
+        return pd.DataFrame(data, columns=self.columns)
+
+def decodeMediciones(chunks, code=None) -> pd.DataFrame:
+    """
+    Streaming counterpart of `pd.DataFrame(response.json())` plus the wind-farm
+    filter: rows are resolved as they are parsed and only kept ones are buffered.
+    """
+    buffers = None
+    for row in _iterJsonArray(chunks):
+        name = row.get('NombreEquipo')
+        farm, status = resolveEquipment(name) if isinstance(name, str) else (None, 'drop')
+        if status == 'unknown':
+            _recordUnknown(name, code)
+        if status != 'farm':
+            continue
+        if buffers is None:
+            #-- same columns as obj.iloc[:,:-48] --#
+            buffers = _ColumnBuffers(list(row)[:-48])
+        buffers.append(row)
+    return buffers.frame() if buffers is not None else pd.DataFrame()
+
+def _untilDeadline(chunks, deadlineAt):
+    #-- `timeout` only bounds each socket read; this bounds the whole body --#
+    for chunk in chunks:
+        if time.monotonic() > deadlineAt:
+            raise requests.exceptions.Timeout("Deadline reached while reading the response")
+        yield chunk
+
 def clientCoes(code:int, service, startDate, 
-               endDate, *args, **kwargs):
+               endDate, *args, session=None, timeout=60, stream=False,
+               raiseErrors=False, cache=None, deadlineAt=None, **kwargs):
+    """
+    Fetch one lectcodi from api/Mediciones and keep the wind-farm rows.
+    `stream=True` decodes the response incrementally with bounded memory.
+    `deadlineAt` (a time.monotonic() value) aborts a download still running
+    past it, on top of the per-read `timeout`.
+    `cache` (a ResponseCache) serves and stores raw bodies keyed by
+    (service, lectcodi, fechaIni, fechaFin).
+    Errors are logged and yield an empty frame unless `raiseErrors` is set.
+    """
     #-- Settings --#
+    ttl = cache.ttl_for(endDate) if cache is not None else None
     startDate = startDate.strftime("%Y-%m-%d")
     endDate = endDate.strftime("%Y-%m-%d")
     api = f'api/Mediciones?lectcodi={code}&fechaIni={startDate}&fechaFin={endDate}'
     url = f'{service}{api}'
+    http = session if session is not None else requests
+    response = None
     
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        obj = pd.DataFrame(response.json())
+        key = cache.key(service, code, startDate, endDate) if cache is not None else None
+        chunks = cache.open(key) if cache is not None else None
+        if chunks is None:
+            response = http.get(url, timeout=timeout, stream=stream or deadlineAt is not None)
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=1 << 16)
+            if deadlineAt is not None:
+                chunks = _untilDeadline(chunks, deadlineAt)
+            if cache is not None:
+                chunks = cache.store(key, chunks, ttl=ttl)
+        if stream:
+            obj = decodeMediciones(chunks, code=code)
+            deque(chunks, maxlen=0)  # consume the tail so a cache entry commits
+            logger.info(f"Successfully retrieved data for code {code}")
+            return obj
+        obj = pd.DataFrame(json.loads(b''.join(chunks)))
         if not obj.empty:
-            queryList = ['Cupis', 'Dunas', 'Huambos', 'Marcona', 'Lomitas', 
-                         'Talara', 'Hermanas', 'Wayra', 'C.E.' ]
-            obj = obj[obj['NombreEquipo'].str.contains('|'.join(queryList), case=False, regex=True)].copy()
-            queryList = ['TV', 'C.H.', 'C.S.']
-            obj = obj[~obj['NombreEquipo'].str.contains('|'.join(queryList), case=False, regex=True)].copy()
+            obj = obj[mapEquipment(obj['NombreEquipo'], code=code).notna()].copy()
         logger.info(f"Successfully retrieved data for code {code}")
         return obj.iloc[:,:-48]
     
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed for code {code}: {e}")
+        if raiseErrors:
+            raise
         return pd.DataFrame()
     except Exception as e:
         logger.error(f"Unexpected error processing code {code}: {e}")
+        if raiseErrors:
+            raise
+        return pd.DataFrame()
+    finally:
+        if response is not None:
+            response.close()
+
+def fetchCoesConcurrent(codes, service, startDate, endDate, *args,
+                        maxWorkers=4, timeout=60, deadline=300, tagCode=False, **kwargs):
+    """
+    Fetch several lectcodi codes in parallel over one pooled session.
+    `timeout` bounds each socket read and `deadline` bounds the whole run:
+    downloads still running at the deadline are aborted, and those codes are
+    logged and left out. Returns the frames
+    concatenated in `codes` order, as the serial loop did.
+    `startDate` may also be a {code: date} mapping for per-code windows, and
+    `tagCode` adds a `lectcodi` column with the originating code.
+    """
+    codes = list(codes)
+    session = buildSession(poolSize=maxWorkers)
+    t0 = time.perf_counter()
+    deadlineAt = time.monotonic() + deadline
+
+    def _timed(code):
+        tic = time.perf_counter()
+        start = startDate[code] if isinstance(startDate, dict) else startDate
+        result = clientCoes(code, service, start, endDate,
+                            session=session, timeout=timeout, deadlineAt=deadlineAt, **kwargs)
+        if tagCode and not result.empty:
+            result = result.assign(lectcodi=code)
+        logger.info(f"Code {code}: {len(result)} rows in {time.perf_counter() - tic:.2f}s")
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=maxWorkers)
+    try:
+        futures = {code: executor.submit(_timed, code) for code in codes}
+        _, pending = wait(futures.values(), timeout=deadline)
+        container = []
+        for code, future in futures.items():
+            if future in pending:
+                future.cancel()
+                logger.warning(f"Code {code} did not finish within the {deadline}s deadline")
+                continue
+            result = future.result()
+            if not result.empty:
+                container.append(result)
+    finally:
+        #-- running downloads stop at deadlineAt; close the session once they have --#
+        executor.shutdown(wait=True, cancel_futures=True)
+        session.close()
+    logger.info(f"Fetched {len(codes)} codes in {time.perf_counter() - t0:.2f}s")
+    if kwargs.get('cache') is not None:
+        logger.info(kwargs['cache'].summary())
+    if not container:
         return pd.DataFrame()
+    return pd.concat(container, ignore_index=False)
+
+def _meltHalfHours(dataset: pd.DataFrame):
+    """
+    Reference reshape: melt h1..h48 and derive each offset from the column label.
+    """
+    idxNames = [c for c in dataset.columns if not any(f'h{w}' in c for w in range(1,49))]
+    data = dataset.melt(id_vars=idxNames, value_name='power', var_name='hour').sort_values(['NombreEquipo','Medifecha'])
+    data['Medifecha'] = pd.to_datetime(data['Medifecha'], format="%Y-%m-%dT00:00:00")
+    data['hour_timedelta'] = pd.to_timedelta(data['hour'].str.replace('h', '').astype(int) * 30, unit='m')
+    data['date'] = data['Medifecha'] + data['hour_timedelta']
+    data = data[['date']+idxNames+['power']]
+    return data.sort_values(['NombreEquipo','date'])
+
+def _reshapeHalfHours(dataset: pd.DataFrame):
+    """
+    Vectorized reshape: read h1..h48 as a (rows, 48) array and broadcast
+    Medifecha against a fixed 30-minute offset vector. Rows sorted by
+    (NombreEquipo, Medifecha) stay sorted by (NombreEquipo, date) once
+    flattened, so a single stable sort is enough.
+    """
+    hCols = [h for h in HALF_HOURS if h in dataset.columns]
+    idxNames = [c for c in dataset.columns if c not in hCols]
+    offsets = (np.array([int(h[1:]) for h in hCols]) * 30).astype('timedelta64[m]')
+    wide = dataset.sort_values(['NombreEquipo','Medifecha'], kind='stable')
+    medifecha = pd.to_datetime(wide['Medifecha'], format="%Y-%m-%dT00:00:00").to_numpy(dtype='datetime64[ns]')
+    power = wide[hCols].to_numpy(dtype='float64')
+    rows = np.repeat(np.arange(len(wide)), len(hCols))
+    data = wide[idxNames].iloc[rows].reset_index(drop=True)
+    data['Medifecha'] = medifecha[rows]
+    data.insert(0, 'date', (medifecha[:, None] + offsets[None, :]).ravel())
+    data['power'] = power.ravel()
+    return data
 
-def getFormatData(dataset: pd.DataFrame, *args, **kwargs):
+def getFormatData(dataset: pd.DataFrame, *args, engine='numpy', **kwargs):
+    """
+    Reshape raw COES rows to long format and resolve equipment to wind farms.
+    `engine='melt'` keeps the original melt-based reshape for comparison.
+    """
     try:
-        idxNames = [c for c in dataset.columns if not any(f'h{w}' in c for w in range(1,49))]
-        data = dataset.melt(id_vars=idxNames, value_name='power', var_name='hour').sort_values(['NombreEquipo','Medifecha'])
-        data['Medifecha'] = pd.to_datetime(data['Medifecha'], format="%Y-%m-%dT00:00:00")
-        data['hour_timedelta'] = pd.to_timedelta(data['hour'].str.replace('h', '').astype(int) * 30, unit='m')
-        data['date'] = data['Medifecha'] + data['hour_timedelta']
-        data = data[['date']+idxNames+['power']]
-        data = data.sort_values(['NombreEquipo','date'])
-        #-- Punta Lomitas --#
-        puntaLomitas = data[data['NombreEquipo'].str.contains('PUN', case=False, regex=True)]
-        puntaLomitas = puntaLomitas.groupby(['date']).agg({'NombreEmpresa':'last', 'Tipoinfoabrev':'last', 'power':'sum'}).reset_index()
-        puntaLomitas['name'] = 'W.F. Punta Lomitas'
-        #-- All except Punta Lomitas --#
-        epuntaLomitas = data[~data['NombreEquipo'].str.contains('|'.join(['PUN','paita']), 
-                                                                case=False, regex=True)]
-        repNames = {
-            'C.E. CUPISNIQUE':'W.F. Cupisnique',
-            'C.E. DUNA':'W.F. Duna',
-            'C.E. HUAMBOS':'W.F. Huambos',
-            'C.E. MARCONA':'W.F. Marcona',
-            'C.E. SAN JUAN':'W.F. San Juan',
-            'C.E. TALARA':'W.F. Talara',
-            'C.E. TRES HERMANAS':'W.F. Tres Hermanas',
-            'C.E. WAYRA EXTENSION':'W.F. Wayra Ext',
-            'C.E. WAYRA I':'W.F. Wayra I'
-        }
-        epuntaLomitas.loc[:,'NombreEquipo'] = epuntaLomitas['NombreEquipo'].replace(repNames)
-        epuntaLomitas = epuntaLomitas.rename({'NombreEquipo':'name'},axis=1)
-        epuntaLomitas = epuntaLomitas[puntaLomitas.columns]
+        dataset = dataset.assign(name=mapEquipment(dataset['NombreEquipo']))
+        dataset = dataset[dataset['name'].notna()]
+        if engine == 'melt':
+            data = _meltHalfHours(dataset)
+        else:
+            data = _reshapeHalfHours(dataset)
+        #-- Farms reported as several units (Punta Lomitas) --#
+        aggregated = data['name'].isin(AGGREGATED_FARMS)
+        unitFarms = (data[aggregated]
+                     .groupby(['name', 'date'], observed=True, sort=True)
+                     .agg({'NombreEmpresa':'last', 'Tipoinfoabrev':'last', 'power':'sum'})
+                     .reset_index())
+        #-- One unit per farm --#
+        columns = ['date', 'NombreEmpresa', 'Tipoinfoabrev', 'power', 'name']
+        singleFarms = data.loc[~aggregated, columns]
         #-- Merged Both Datasets --#
-        data = pd.concat([puntaLomitas, epuntaLomitas], ignore_index=True)
+        data = pd.concat([unitFarms[columns], singleFarms], ignore_index=True)
+        data['name'] = data['name'].astype(str)
         logger.info("Data formatting completed successfully")
         return data
     except Exception as e:
         logger.error(f"Error in data formatting: {e}")
         raise
 
+def dedupLatest(dataset: pd.DataFrame, keys=('NombreEquipo', 'Medifecha')):
+    """
+    Keep the last row per key in arrival order. A stable sort on the composite
+    key keeps later batches after earlier ones, so one pass comparing each row
+    with its successor finds the survivors. Feeding the result back with a new
+    batch (`dedupLatest(pd.concat([kept, batch]))`) deduplicates incrementally.
+    """
+    keys = list(keys)
+    if dataset.empty:
+        return dataset.reset_index(drop=True)
+    #-- Sort integer key codes instead of strings; lexsort is stable, last key is primary --#
+    codes = [pd.factorize(dataset[k], sort=True)[0] for k in keys]
+    order = np.lexsort(codes[::-1])
+    last = np.zeros(len(order), dtype=bool)
+    last[-1] = True
+    for c in codes:
+        c = c[order]
+        last[:-1] |= c[1:] != c[:-1]
+    return dataset.iloc[order[last]].reset_index(drop=True)
+
+def prepareDataset(dataset: pd.DataFrame, *args, **kwargs):
+    """
+    Deduplicate the raw COES rows and reshape them into the generation format.
+    """
+    #-- Discard duplicates --#
+    dataset = dedupLatest(dataset)
+    dropColumns = ['TensionEquipo', 'CodigoUbicacion', 'NombreUbicacion', '$id', 'lectcodi']
+    dataset = dataset.drop(dropColumns, axis=1, errors='ignore')
+    #-- Set data format --#
+    return getFormatData(dataset)
+
+#-- Incremental ingestion --#
+def loadWatermarks(path: str) -> dict:
+    """
+    Watermarks are {'codes': {code: {farm: last Medifecha day with power}},
+    'farms': {name: last date}}. Files written with one day per code still load.
+    """
+    if not os.path.exists(path):
+        return {'codes': {}, 'farms': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def saveWatermarks(watermarks: dict, path: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+#-- Schema --#
+def applyGenSchema(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast formatted generation to GEN_SCHEMA: local timestamps in GEN_TIMEZONE,
+    categorical strings and float32 power.
+    """
+    data = data[GEN_SCHEMA.names].copy()
+    date = pd.to_datetime(data['date'])
+    data['date'] = date.dt.tz_localize(GEN_TIMEZONE) if date.dt.tz is None else date.dt.tz_convert(GEN_TIMEZONE)
+    for c in ['NombreEmpresa', 'Tipoinfoabrev', 'name']:
+        data[c] = data[c].astype('category')
+    data['power'] = data['power'].astype('float32')
+    return data
+
+def writeGeneration(data: pd.DataFrame, path: str):
+    """
+    Write currentGen.parquet with GEN_SCHEMA and its schema version.
+    """
+    atomic_write_parquet(applyGenSchema(data), path, schema=GEN_SCHEMA)
+
+def readGeneration(path: str) -> pd.DataFrame:
+    """
+    Read a generation file, refusing files written with another schema version.
+    """
+    version = (pq.read_schema(path).metadata or {}).get(b'gen_schema_version', b'').decode()
+    if version != GEN_SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version '{version}', expected '{GEN_SCHEMA_VERSION}'")
+    return pd.read_parquet(path)
+
+def upsertGeneration(data: pd.DataFrame, storePath: str):
+    """
+    Upsert formatted generation into the farm/month partitioned store keyed on (name, date).
+    """
+    data = applyGenSchema(data)
+    return upsert_partitions(data, storePath, keys=['name', 'date'],
+                             partitions={'farm': data['name'].astype(str),
+                                         'month': data['date'].dt.strftime('%Y-%m')},
+                             schema=GEN_SCHEMA)
+
+def _codeFarmWatermarks(raw: pd.DataFrame) -> dict:
+    """
+    Last Medifecha day with any non-null power per (lectcodi, farm) in raw rows.
+    """
+    hCols = [h for h in HALF_HOURS if h in raw.columns]
+    reported = raw[raw[hCols].notna().any(axis=1)]
+    reported = reported.assign(name=mapEquipment(reported['NombreEquipo']),
+                               day=reported['Medifecha'].astype(str).str[:10])
+    last = reported.dropna(subset=['name']).groupby(['lectcodi', 'name'], observed=True)['day'].max()
+    return {(str(code), str(name)): day for (code, name), day in last.items()}
+
+def _codeStart(marks, endDate, lookbackDays, refetchDays, maxLagDays):
+    #-- the least advanced farm of the code sets the start; long-silent farms are ignored --#
+    if marks is None:
+        return endDate - datetime.timedelta(days=lookbackDays)
+    if isinstance(marks, str):
+        marks = {'': marks}
+    days = [datetime.datetime.fromisoformat(d) for d in marks.values()]
+    floor = max(days) - datetime.timedelta(days=maxLagDays)
+    return min(d for d in days if d >= floor) - datetime.timedelta(days=refetchDays)
+
+def ingestIncremental(codes, service, endDate, storePath, watermarkPath, *args,
+                      lookbackDays=5, refetchDays=2, maxLagDays=31, **kwargs):
+    """
+    Fetch each code from the watermark of its least advanced farm (minus
+    `refetchDays` to pick up COES revisions) up to `endDate`, upsert the
+    result into the store and advance the watermarks. Watermarks only move on
+    non-null power, so days a farm has not reported yet are fetched again.
+    Codes without a watermark start `lookbackDays` back, and farms silent for
+    more than `maxLagDays` past the code's newest farm no longer hold it back.
+    """
+    watermarks = loadWatermarks(watermarkPath)
+    starts = {}
+    for code in codes:
+        starts[code] = _codeStart(watermarks['codes'].get(str(code)), endDate,
+                                  lookbackDays, refetchDays, maxLagDays)
+        logger.info(f"Code {code}: fetching from {starts[code].strftime('%Y-%b-%d')}")
+    raw = fetchCoesConcurrent(list(codes), service, starts, endDate, tagCode=True, **kwargs)
+    if raw.empty:
+        logger.warning("No new data was retrieved from any of the codes")
+        return pd.DataFrame()
+    #-- Advance per-(code, farm) watermarks --#
+    for (code, name), last in _codeFarmWatermarks(raw).items():
+        marks = watermarks['codes'].get(code)
+        if not isinstance(marks, dict):
+            marks = watermarks['codes'][code] = {}
+        marks[name] = max(marks.get(name, last), last)
+    data = prepareDataset(raw)
+    upsertGeneration(data, storePath)
+    #-- Advance per-farm watermarks --#
+    for name, last in data.dropna(subset=['power']).groupby('name')['date'].max().items():
+        previous = watermarks['farms'].get(name)
+        watermarks['farms'][name] = max(previous, last.isoformat()) if previous else last.isoformat()
+    saveWatermarks(watermarks, watermarkPath)
+    logger.info(f"Incremental ingest stored {len(data)} rows; farm watermarks: {watermarks['farms']}")
+    return data
+
 #-- Run code --#
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='COES wind generation client')
+    parser.add_argument('--incremental', action='store_true',
+                        help='fetch from the stored watermarks and upsert into the generation store')
+    parser.add_argument('--store', default='../dataset/generation',
+                        help='partitioned generation store used by --incremental')
+    parser.add_argument('--refetch-days', type=int, default=2,
+                        help='days re-fetched before each watermark to catch COES revisions')
+    parser.add_argument('--stream', action='store_true',
+                        help='decode api/Mediciones responses incrementally (bounded memory)')
+    parser.add_argument('--cache', default='../dataset/.httpCache',
+                        help='on-disk api/Mediciones response cache')
+    parser.add_argument('--no-cache', action='store_true', help='always hit api/Mediciones')
+    cli = parser.parse_args()
+    cache = None if cli.no_cache else ResponseCache(cli.cache)
     try:
         service = 'https://appserver.coes.org.pe/waMediciones/'
         endDate = datetime.datetime.now()
@@ -101,28 +559,34 @@ if __name__ == '__main__':
         #-- Create Dataset Dir --#
         parquet_path = '../dataset/currentGen.parquet'
         os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
-        #-- Iterations through codes --#
-        container = []
-        for code in range(0, 4):
-            logger.debug(f"Processing code {code}")
-            result = clientCoes(code, service, startDate, endDate)
-            if not result.empty:
-                container.append(result)
-        if container:
-            dataset = pd.concat(container, ignore_index=False)
-            #-- Discard duplicates --#
-            dataset = dataset.groupby("NombreEquipo", group_keys=True)\
-                           .apply(lambda x: x.drop_duplicates(subset=['Medifecha'], keep='last'))\
-                           .reset_index()
-            dropColumns = ['TensionEquipo', 'CodigoUbicacion', 'NombreUbicacion', 'index', '$id']
-            dataset = dataset.drop(dropColumns, axis=1, errors='ignore')
-            #-- Set data format --#
-            dataset = getFormatData(dataset)
-            logger.info(f"Coes Dataset was retrieved! Shape: {dataset.shape}")
-            #-- Export as parquet --#
-            dataset.to_parquet(parquet_path)
-            logger.info(f"Coes Dataset was stored!")
+        if cli.incremental:
+            #-- Watermark-based fetch into the partitioned store --#
+            ingestIncremental(range(0, 4), service, endDate, cli.store,
+                              os.path.join(cli.store, '_watermarks.json'),
+                              refetchDays=cli.refetch_days, stream=cli.stream, cache=cache,
+                              maxWorkers=4, timeout=60, deadline=300)
+            #-- Dashboard snapshot: last 5 days from the store --#
+            months = {d.strftime('%Y-%m') for d in pd.date_range(startDate.date(), endDate.date(), freq='D')}
+            dataset = read_partitions(cli.store, filters={'month': months})
+            if not dataset.empty:
+                dataset = dataset[dataset['date'] >= pd.Timestamp(startDate.date(), tz=GEN_TIMEZONE)]
+                writeGeneration(dataset, parquet_path)
+                logger.info(f"Coes snapshot was stored! Shape: {dataset.shape}")
+            else:
+                logger.warning("Generation store is empty; snapshot was not written")
         else:
-            logger.warning("No data was retrieved from any of the codes")
+            #-- Concurrent fetch through codes --#
+            dataset = fetchCoesConcurrent(range(0, 4), service, startDate, endDate,
+                                          stream=cli.stream, cache=cache,
+                                          maxWorkers=4, timeout=60, deadline=300)
+            if not dataset.empty:
+                dataset = prepareDataset(dataset)
+                logger.info(f"Coes Dataset was retrieved! Shape: {dataset.shape}")
+                #-- Export as parquet --#
+                writeGeneration(dataset, parquet_path)
+                logger.info(f"Coes Dataset was stored!")
+            else:
+                logger.warning("No data was retrieved from any of the codes")
+        writeEquipmentReview('../dataset/unknownEquipment.csv')
     except Exception as e:
         logger.exception("An unexpected error occurred during execution")
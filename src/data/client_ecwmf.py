@@ -1,9 +1,118 @@
 # -*- coding: utf-8 -*-
+import time
+import logging
+import threading
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import os
+import hashlib
+from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Union
+import pyarrow as pa
+from parquet_store import atomic_write_parquet, upsert_partitions
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second with bursts up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until one token is available and take it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ERA5DayCache:
+    """
+    Day-granular local store of ERA5 hourly values, one folder per
+    (lat, lon, variable set, units, timezone) with one Parquet file per month.
+    Only complete days (no missing values) are kept, so days still being
+    filled in by the archive are fetched again on the next run.
+    """
+
+    def __init__(self, root: str, hourly_vars: List[str], windspeed_unit: str, timezone: str):
+        self.root = root
+        self.hourly_vars = list(hourly_vars)
+        vars_key = hashlib.sha1(",".join(sorted(hourly_vars)).encode("utf-8")).hexdigest()[:10]
+        self.suffix = f"{windspeed_unit}_{timezone.replace('/', '-')}_{vars_key}"
+
+    def _folder(self, lat: float, lon: float) -> str:
+        return os.path.join(self.root, f"{lat:.4f}_{lon:.4f}_{self.suffix}")
+
+    def _months(self, lat: float, lon: float, start: date, end: date) -> List[str]:
+        months = pd.period_range(start, end, freq="M").strftime("%Y-%m")
+        folder = self._folder(lat, lon)
+        return [p for p in (os.path.join(folder, f"{m}.parquet") for m in months) if os.path.exists(p)]
+
+    def load(self, lat: float, lon: float, start: date, end: date) -> pd.DataFrame:
+        """
+        Cached hourly rows for the days in [start, end].
+        """
+        files = self._months(lat, lon, start, end)
+        if not files:
+            return pd.DataFrame(columns=["time"] + self.hourly_vars)
+        df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+        days = df["time"].dt.date
+        return df[(days >= start) & (days <= end)].reset_index(drop=True)
+
+    def missing_ranges(self, lat: float, lon: float, start: date, end: date) -> List[tuple]:
+        """
+        Contiguous (first, last) day ranges in [start, end] that are not cached.
+        """
+        cached = set()
+        for f in self._months(lat, lon, start, end):
+            cached.update(pd.read_parquet(f, columns=["time"])["time"].dt.date)
+        ranges = []
+        for day in pd.date_range(start, end, freq="D").date:
+            if day in cached:
+                continue
+            if ranges and ranges[-1][1] == day - timedelta(days=1):
+                ranges[-1] = (ranges[-1][0], day)
+            else:
+                ranges.append((day, day))
+        return ranges
+
+    def store(self, lat: float, lon: float, hourly: pd.DataFrame):
+        """
+        Merge the complete days of `hourly` into the monthly files.
+        """
+        if hourly.empty:
+            return
+        days = hourly["time"].dt.date
+        complete = hourly[self.hourly_vars].notna().all(axis=1).groupby(days).transform("all")
+        hours = days.map(days.value_counts())
+        hourly = hourly[complete & (hours >= 23)]
+        folder = self._folder(lat, lon)
+        for month, chunk in hourly.groupby(hourly["time"].dt.strftime("%Y-%m")):
+            path = os.path.join(folder, f"{month}.parquet")
+            if os.path.exists(path):
+                chunk = pd.concat([pd.read_parquet(path), chunk], ignore_index=True)
+            chunk = chunk.drop_duplicates(subset="time", keep="last").sort_values("time")
+            atomic_write_parquet(chunk[["time"] + self.hourly_vars], path)
 
 
 class ECMWFReanalysisClient:
@@ -13,6 +122,8 @@ class ECMWFReanalysisClient:
     """
 
     ERA5_URL = "https://archive-api.open-meteo.com/v1/era5"
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 30]
 
     def __init__(
         self,
@@ -21,6 +132,12 @@ class ECMWFReanalysisClient:
         windspeed_unit: str = "ms",  # ms | kmh | mph | kn
         hourly_vars: Optional[List[str]] = None,
         request_timeout: int = 60,
+        max_locations: int = 100,
+        max_workers: int = 1,
+        requests_per_minute: float = 600,
+        retry_budget: int = 10,
+        cache_dir: Optional[str] = None,
+        max_days_per_request: int = 31,
     ):
         """
         :param wind_farms: list of dicts with keys: name, lat, lon
@@ -28,11 +145,31 @@ class ECMWFReanalysisClient:
         :param windspeed_unit: velocity unit requested from API
         :param hourly_vars: list of hourly variables to request
         :param request_timeout: HTTP timeout (seconds)
+        :param max_locations: coordinates per multi-location request (batched mode)
+        :param max_workers: concurrent requests; 1 keeps the serial loop
+        :param requests_per_minute: token-bucket rate matched to the archive API quota
+        :param retry_budget: retries shared by all requests of one fetch_range_for_all call
+        :param cache_dir: day-granular ERA5 cache; only missing days are requested
+        :param max_days_per_request: with the cache, missing ranges are fetched and
+            cached in chunks of at most this many days, so long pulls can resume
         """
         self.wind_farms = wind_farms
+        self.farm_names = sorted({p["name"] for p in wind_farms})
         self.timezone = timezone
         self.windspeed_unit = windspeed_unit
         self.request_timeout = request_timeout
+        self.max_locations = max_locations
+        self.max_workers = max_workers
+        self.max_retries = retry_budget
+        self.retry_budget = retry_budget
+        self.rate_limiter = TokenBucket(rate=requests_per_minute / 60.0,
+                                        capacity=max(1, max_workers))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_workers))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.latencies: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
 
         if hourly_vars is None:
             hourly_vars = [
@@ -43,83 +180,298 @@ class ECMWFReanalysisClient:
                 "wind_direction_100m",
             ]
         self.hourly_vars = hourly_vars
+        self.max_days_per_request = max_days_per_request
+        self.cache = None
+        if cache_dir:
+            self.cache = ERA5DayCache(cache_dir, hourly_vars, windspeed_unit, timezone)
 
-    def _fetch_point(self, lat: float, lon: float, name: str,
-                     start_date: str, end_date: str) -> pd.DataFrame:
+    def _params(self, lats: List[float], lons: List[float],
+                start_date: str, end_date: str) -> Dict[str, str]:
         """
-        Fetch ERA5 hourly data for a single point.
+        Query parameters for one request; several points are comma-joined.
         """
-        params = {
-            "latitude": lat,
-            "longitude": lon,
+        return {
+            "latitude": ",".join(str(v) for v in lats),
+            "longitude": ",".join(str(v) for v in lons),
             "start_date": start_date,
             "end_date": end_date,
             "hourly": ",".join(self.hourly_vars),
             "timezone": self.timezone,
             "windspeed_unit": self.windspeed_unit,
+            "timeformat": "unixtime",
         }
 
-        r = requests.get(self.ERA5_URL, params=params, timeout=self.request_timeout)
-        r.raise_for_status()
-        payload = r.json()
+    def _take_retry(self) -> bool:
+        with self._lock:
+            if self.retry_budget <= 0:
+                return False
+            self.retry_budget -= 1
+            return True
+
+    def _request(self, params: Dict[str, str], label: str = "") -> List[dict]:
+        """
+        GET the archive API; always returns a list of per-location payloads.
+        Requests are rate limited, and throttling, server errors and dropped
+        connections are retried with backoff while the retry budget lasts.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            tic = time.perf_counter()
+            try:
+                r = self.session.get(self.ERA5_URL, params=params, timeout=self.request_timeout)
+                if r.status_code in self.RETRY_STATUS:
+                    r.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if (status is None or status in self.RETRY_STATUS) and self._take_retry():
+                    attempt += 1
+                    logger.warning(f"ERA5 request {label} failed ({e}); retry {attempt}")
+                    time.sleep(min(30.0, 2.0 ** attempt))
+                    continue
+                raise
+            with self._lock:
+                self.latencies.setdefault(label, []).append(time.perf_counter() - tic)
+            r.raise_for_status()
+            payload = r.json()
+            return payload if isinstance(payload, list) else [payload]
+
+    def _map(self, fn: Callable, items: list) -> list:
+        """
+        Apply `fn` to `items` in order, on a thread pool when max_workers > 1.
+        """
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(fn, items))
+
+    def latency_report(self) -> str:
+        """
+        Histogram of request latencies plus per-point count/mean/max.
+        """
+        samples = np.array([v for values in self.latencies.values() for v in values])
+        if samples.size == 0:
+            return "ERA5 latency: no requests"
+        edges = [0.0] + self.LATENCY_BUCKETS + [np.inf]
+        counts, _ = np.histogram(samples, bins=edges)
+        lines = [f"ERA5 latency over {samples.size} requests: "
+                 f"p50={np.percentile(samples, 50):.2f}s p95={np.percentile(samples, 95):.2f}s"]
+        for lo, hi, n in zip(edges[:-1], edges[1:], counts):
+            lines.append(f"  {lo:>5.2f}-{hi:<5.2f}s {n:>5} {'#' * int(40 * n / samples.size)}")
+        for label, values in sorted(self.latencies.items()):
+            lines.append(f"  {label}: n={len(values)} mean={np.mean(values):.2f}s max={np.max(values):.2f}s")
+        return "\n".join(lines)
 
+    def _decode_hourly(self, payload: dict) -> pd.DataFrame:
+        """
+        `time` plus the hourly variables of one location payload, without
+        string parsing: the Unix time axis is converted to local wall time in
+        `self.timezone` in one vectorized step (DST aware), and each variable
+        loads as float32.
+        """
         hourly = payload.get("hourly", {})
         if not hourly or "time" not in hourly:
-            # Return an empty DataFrame with consistent columns if no data
-            cols = ["name", "lat", "lon", "time"] + self.hourly_vars
-            return pd.DataFrame(columns=cols)
+            return pd.DataFrame(columns=["time"] + self.hourly_vars)
+        t = np.asarray(hourly["time"], dtype="int64")
+        # naive timestamps in the requested timezone, as before
+        local = pd.to_datetime(t, unit="s", utc=True).tz_convert(self.timezone).tz_localize(None)
+        data = {"time": local.to_numpy(dtype="datetime64[ns]")}
+        for v in self.hourly_vars:
+            data[v] = np.asarray(hourly.get(v, [np.nan] * t.size), dtype="float32")
+        return pd.DataFrame(data)
+
+    def _label(self, hourly: pd.DataFrame, lat: float, lon: float, name: str) -> pd.DataFrame:
+        """
+        Long-format frame for one farm: name (categorical over the farm
+        names), lat, lon, time, then the variables.
+        """
+        categories = self.farm_names if name in self.farm_names else [name]
+        n = len(hourly)
+        columns = {
+            "name": pd.Categorical.from_codes(np.full(n, categories.index(name), dtype="int16"),
+                                              categories=categories),
+            "lat": np.full(n, lat, dtype="float64"),
+            "lon": np.full(n, lon, dtype="float64"),
+        }
+        columns["time"] = hourly["time"].to_numpy() if n else np.array([], dtype="datetime64[ns]")
+        for v in self.hourly_vars:
+            columns[v] = hourly[v].to_numpy(dtype="float32") if n else np.array([], dtype="float32")
+        return pd.DataFrame(columns)
+
+    def _to_frame(self, payload: dict, lat: float, lon: float, name: str) -> pd.DataFrame:
+        """
+        Long-format frame for one location payload.
+        """
+        return self._label(self._decode_hourly(payload), lat, lon, name)
+
+    def _fetch_point(self, lat: float, lon: float, name: str,
+                     start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Fetch ERA5 hourly data for a single point.
+        """
+        payload = self._request(self._params([lat], [lon], start_date, end_date), label=name)[0]
+        return self._to_frame(payload, lat, lon, name)
+
+    def _fetch_coords(self, coords: List[tuple], start_date: str, end_date: str,
+                      per_request: int, labels: Optional[Dict[tuple, str]] = None) -> Dict[tuple, pd.DataFrame]:
+        """
+        Hourly frames for unique (lat, lon) coordinates, `per_request` per call.
+        """
+        labels = labels or {}
 
-        df = pd.DataFrame(hourly)
-        df["time"] = pd.to_datetime(df["time"])  # already in requested timezone
-        df["name"] = name
-        df["lat"] = lat
-        df["lon"] = lon
+        def _fetch_chunk(chunk):
+            label = labels.get(chunk[0], str(chunk[0])) if len(chunk) == 1 else f"batch of {len(chunk)}"
+            payloads = self._request(self._params([c[0] for c in chunk], [c[1] for c in chunk],
+                                                  start_date, end_date), label=label)
+            if len(payloads) != len(chunk):
+                raise ValueError(f"Expected {len(chunk)} locations from the archive API, got {len(payloads)}")
+            return chunk, payloads
 
-        ordered_cols = ["name", "lat", "lon", "time"] + [
-            c for c in df.columns if c not in {"name", "lat", "lon", "time"}
-        ]
-        return df[ordered_cols]
+        chunks = [coords[i:i + per_request] for i in range(0, len(coords), per_request)]
+        hourly = {}
+        for chunk, payloads in self._map(_fetch_chunk, chunks):
+            for coord, payload in zip(chunk, payloads):
+                hourly[coord] = self._decode_hourly(payload)
+        return hourly
+
+    @staticmethod
+    def _group_coords(points: List[Dict[str, float]]) -> Dict[tuple, List[str]]:
+        by_coord: Dict[tuple, List[str]] = {}
+        for p in points:
+            by_coord.setdefault((p["lat"], p["lon"]), []).append(p["name"])
+        return by_coord
+
+    def _fetch_batch(self, points: List[Dict[str, float]],
+                     start_date: str, end_date: str) -> List[pd.DataFrame]:
+        """
+        Fetch ERA5 hourly data for many points with multi-location requests.
+        Identical coordinates are requested once and shared by every farm on
+        them; at most `max_locations` coordinates go in each request.
+        """
+        by_coord = self._group_coords(points)
+        labels = {c: ",".join(names) for c, names in by_coord.items()}
+        hourly = self._fetch_coords(list(by_coord), start_date, end_date, self.max_locations, labels)
+        return [self._label(hourly[(p["lat"], p["lon"])], p["lat"], p["lon"], p["name"]) for p in points]
+
+    def _split_days(self, lo: date, hi: date) -> List[tuple]:
+        """
+        [lo, hi] as consecutive (first, last) chunks of at most max_days_per_request days.
+        """
+        step = timedelta(days=max(1, self.max_days_per_request))
+        chunks = []
+        while lo <= hi:
+            chunks.append((lo, min(hi, lo + step - timedelta(days=1))))
+            lo = chunks[-1][1] + timedelta(days=1)
+        return chunks
+
+    def _fetch_cached(self, points: List[Dict[str, float]], start: date, end: date,
+                      batched: bool) -> List[pd.DataFrame]:
+        """
+        Serve cached days from the day cache and fetch only the missing day
+        ranges. Coordinates missing the same ranges share requests. Ranges go
+        out in bounded chunks, each cached as soon as it arrives, so a failed
+        multi-year pull resumes from the last chunk on the next run.
+        """
+        by_coord = self._group_coords(points)
+        labels = {c: ",".join(names) for c, names in by_coord.items()}
+        plan: Dict[tuple, List[tuple]] = {}
+        for coord in by_coord:
+            plan.setdefault(tuple(self.cache.missing_ranges(*coord, start, end)), []).append(coord)
+
+        fresh: Dict[tuple, List[pd.DataFrame]] = {c: [] for c in by_coord}
+        fetched_days = 0
+        for ranges, coords in plan.items():
+            for lo, hi in (chunk for r in ranges for chunk in self._split_days(*r)):
+                got = self._fetch_coords(coords, lo.isoformat(), hi.isoformat(),
+                                         self.max_locations if batched else 1, labels)
+                for coord, hourly in got.items():
+                    self.cache.store(*coord, hourly)
+                    fresh[coord].append(hourly)
+                fetched_days += ((hi - lo).days + 1) * len(coords)
+        total_days = ((end - start).days + 1) * len(by_coord)
+        logger.info(f"ERA5 cache: fetched {fetched_days} of {total_days} point-days, "
+                    f"{total_days - fetched_days} served from {self.cache.root}")
+
+        frames = []
+        for p in points:
+            coord = (p["lat"], p["lon"])
+            hourly = pd.concat([self.cache.load(*coord, start, end)] + fresh[coord], ignore_index=True)
+            hourly = (hourly.drop_duplicates(subset="time", keep="last")
+                            .sort_values("time")
+                            .reset_index(drop=True))
+            frames.append(self._label(hourly, p["lat"], p["lon"], p["name"]))
+        return frames
 
     def fetch_range_for_all(
         self,
         start_date: datetime,
         end_date: datetime,
-    ) -> pd.DataFrame:
+        batched: bool = False,
+        filepath: Optional[str] = "../dataset/ecmwf_windSpeed.parquet",
+        store_dir: Optional[str] = None,
+        as_arrow: bool = False,
+    ) -> Union[pd.DataFrame, pa.Table]:
         """
         Fetch ERA5 hourly data for all wind farms in the provided date range.
 
         :param start_date: naive or tz-aware datetime (date portion used)
         :param end_date: naive or tz-aware datetime (date portion used)
-        :return: concatenated DataFrame for all wind farms
+        :param batched: deduplicate coordinates and use multi-location requests
+        :param filepath: Parquet file atomically replaced with this window (None skips it)
+        :param store_dir: partitioned reanalysis store the window is upserted into
+        :param as_arrow: return a pyarrow Table instead of a DataFrame
+        :return: concatenated frame for all wind farms, with `time` renamed to `date`
         """
         start_str = start_date.strftime("%Y-%m-%d")
         end_str = end_date.strftime("%Y-%m-%d")
+        self.latencies = {}
+        self.retry_budget = self.max_retries
 
-        frames = []
-        for p in self.wind_farms:
-            frames.append(self._fetch_point(
+        if self.cache is not None:
+            frames = self._fetch_cached(self.wind_farms, start_date.date(), end_date.date(), batched)
+        elif batched:
+            frames = self._fetch_batch(self.wind_farms, start_str, end_str)
+        else:
+            frames = self._map(lambda p: self._fetch_point(
                 lat=p["lat"], lon=p["lon"], name=p["name"],
                 start_date=start_str, end_date=end_str
-            ))
+            ), self.wind_farms)
+        logger.info(self.latency_report())
 
         if not frames:
             return pd.DataFrame()
 
         df_ecmwf = pd.concat(frames, ignore_index=True)
         df_ecmwf = df_ecmwf.sort_values(["name", "time"]).reset_index(drop=True)
-        #-- save to parquet --#
         df_ecmwf = df_ecmwf.rename({'time':'date'},axis=1)
-        self.save_to_parquet(df_ecmwf, "../dataset/ecmwf_windSpeed.parquet")
-    
+        #-- persist --#
+        if filepath:
+            self.save_to_parquet(df_ecmwf, filepath)
+        if store_dir:
+            self.upsert_to_store(df_ecmwf, store_dir)
+        if as_arrow:
+            return pa.Table.from_pandas(df_ecmwf, preserve_index=False)
+        return df_ecmwf
+
     def save_to_parquet(self, df: pd.DataFrame, filepath: str):
         """
-        Save the DataFrame to a Parquet file.
+        Save the DataFrame to a Parquet file (write-then-rename).
+        """
+        atomic_write_parquet(df, filepath)
+
+    def upsert_to_store(self, df: pd.DataFrame, store_dir: str):
+        """
+        Upsert into the reanalysis store, partitioned by farm and month and
+        keyed by (name, date), so history grows across runs.
         """
-        df.to_parquet(filepath, index=False)
+        return upsert_partitions(df, store_dir, keys=["name", "date"],
+                                 partitions={"farm": df["name"].astype(str),
+                                             "month": df["date"].dt.strftime("%Y-%m")})
 
 
 #-- Main code --#
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     WIND_FARMS = [
         {"name": "W.F. Cupisnique",    "lon": -79.48, "lat":  -7.55},
         {"name": "W.F. Duna",          "lon": -78.98, "lat":  -6.45},
@@ -140,9 +492,13 @@ if __name__ == "__main__":
         wind_farms=WIND_FARMS,
         timezone="America/Lima",
         windspeed_unit="ms",  # change to "kn" for knots
+        max_workers=4,
+        cache_dir="../dataset/.era5Cache",
     )
 
     client.fetch_range_for_all(
         start_date=datetime.combine(start_date, datetime.min.time()),
         end_date=datetime.combine(end_date, datetime.min.time()),
+        batched=True,
+        store_dir="../dataset/reanalysis",
     )
\ No newline at end of file
@@ -1,10 +1,16 @@
 # -*- coding:utf-8 -*-
 # -- Imports -- #
-import os, json, base64
+import os, json, time, base64, random, tempfile, threading
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import requests
 import ee
 from google.oauth2 import service_account
+from run_cache import RunCache
+from forecast_archive import append_runs
+from wind_profile import add_speed_direction, extrapolate_speed, fit_shear_alpha, shear_coverage
 
 #-- Authentication --#
 class GEE_Client:
@@ -15,6 +21,7 @@ class GEE_Client:
       - or a provided key_path (path or base64).
     """
     _initialized = False
+    _init_lock = threading.Lock()
 
     def __init__(self, key_path: str = None):
         self.key_path = key_path
@@ -23,15 +30,18 @@ class GEE_Client:
     def _authenticate(self):
         if GEE_Client._initialized:
             return
-        cred = self._load_credentials_info()
-        scopes = [
-            "https://www.googleapis.com/auth/earthengine",
-            "https://www.googleapis.com/auth/devstorage.read_only",
-        ]
-        credentials = service_account.Credentials.from_service_account_info(cred, scopes=scopes)
-        ee.Initialize(credentials)
-        GEE_Client._initialized = True
-        print("GEE authenticated.")
+        with GEE_Client._init_lock:
+            if GEE_Client._initialized:
+                return
+            cred = self._load_credentials_info()
+            scopes = [
+                "https://www.googleapis.com/auth/earthengine",
+                "https://www.googleapis.com/auth/devstorage.read_only",
+            ]
+            credentials = service_account.Credentials.from_service_account_info(cred, scopes=scopes)
+            ee.Initialize(credentials)
+            GEE_Client._initialized = True
+            print("GEE authenticated.")
 
     def _load_credentials_info(self) -> dict:
         # 1) If key_path is provided: try file path, then base64
@@ -71,6 +81,226 @@ class GEE_Client:
             img.get("system:time_start"),
         )
 
+#-- Instrumentation --#
+class EEStats:
+    """
+    Earth Engine round trips and decoded payload bytes (compact JSON) for the run.
+    """
+    calls = 0
+    bytes = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, n_bytes: int):
+        with cls._lock:
+            cls.calls += 1
+            cls.bytes += n_bytes
+
+    @classmethod
+    def summary(cls) -> str:
+        return f"Earth Engine: {cls.calls} round trips, {cls.bytes / 1024:.1f} KiB"
+
+def get_info(obj):
+    """
+    `obj.getInfo()` counted in EEStats.
+    """
+    result = obj.getInfo()
+    EEStats.record(len(json.dumps(result, separators=(",", ":"))))
+    return result
+
+def export_properties(col: ee.FeatureCollection, columns, page_size: int = None) -> dict:
+    """
+    Fetch `columns` of every feature with one reduceColumns request, or with
+    `page_size` features per request, and split the rows into column lists.
+    """
+    columns = list(columns)
+
+    def _rows(fc):
+        rows = get_info(fc.reduceColumns(ee.Reducer.toList(len(columns)), columns).get('list'))
+        return rows if len(columns) > 1 else [[r] for r in rows]
+
+    if page_size is None:
+        rows = _rows(col)
+    else:
+        rows, offset = [], 0
+        while True:
+            page = _rows(ee.FeatureCollection(col.toList(page_size, offset)))
+            rows.extend(page)
+            if len(page) < page_size:
+                break
+            offset += page_size
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return {c: list(v) for c, v in zip(columns, values)}
+
+#-- Table export --#
+TABLE_EXPORT_CELLS = 250_000   # above this estimated size, getDataFrame downloads a CSV table
+TEXT_COLUMNS = ('name',)
+
+def estimate_cells(images: ee.ImageCollection, points: ee.FeatureCollection, n_columns: int) -> int:
+    """
+    Values a reduction of `images` over `points` will return (one metadata query).
+    """
+    n_images, n_points = get_info(ee.List([images.size(), points.size()]))
+    return n_images * n_points * n_columns
+
+def download_table(col: ee.FeatureCollection, columns, timeout: int = 600) -> pd.DataFrame:
+    """
+    Download `columns` of a FeatureCollection as CSV, streamed to a temporary
+    file and parsed straight into a frame with fixed dtypes.
+    """
+    columns = list(columns)
+    url = col.getDownloadURL(filetype='CSV', selectors=columns, filename='export')
+    EEStats.record(len(url))
+    dtypes = {c: ('string' if c in TEXT_COLUMNS else 'float64') for c in columns}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'export.csv')
+        n_bytes = 0
+        with requests.get(url, stream=True, timeout=timeout) as r:
+            r.raise_for_status()
+            with open(csv_path, 'wb') as f:
+                for chunk in r.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+                    n_bytes += len(chunk)
+        EEStats.record(n_bytes)
+        if os.path.getsize(csv_path) == 0:
+            return pd.DataFrame({c: pd.Series(dtype=t) for c, t in dtypes.items()})
+        return pd.read_csv(csv_path, usecols=columns, dtype=dtypes)[columns]
+
+#-- Grid chips --#
+def points_from_collection(points: ee.FeatureCollection) -> list:
+    """
+    [{'name', 'lon', 'lat'}] of a point FeatureCollection (one request).
+    """
+    feats = get_info(points)['features']
+    return [{'name': f['properties']['name'],
+             'lon': f['geometry']['coordinates'][0],
+             'lat': f['geometry']['coordinates'][1]} for f in feats]
+
+def chip_grid(lons, lats, res: float, pad: int = 1) -> dict:
+    """
+    North-up EPSG:4326 grid with pixel centres on multiples of `res` (the
+    native GFS/IFS lattice) covering the points plus `pad` cells.
+    """
+    i0, i1 = int(np.floor(np.min(lons) / res)) - pad, int(np.ceil(np.max(lons) / res)) + pad
+    j0, j1 = int(np.floor(np.min(lats) / res)) - pad, int(np.ceil(np.max(lats) / res)) + pad
+    return {
+        'dimensions': {'width': i1 - i0 + 1, 'height': j1 - j0 + 1},
+        'affineTransform': {'scaleX': res, 'shearX': 0, 'translateX': (i0 - 0.5) * res,
+                            'shearY': 0, 'scaleY': -res, 'translateY': (j1 + 0.5) * res},
+        'crsCode': 'EPSG:4326',
+    }
+
+def bilinear_sample(stack: np.ndarray, grid: dict, lons, lats) -> np.ndarray:
+    """
+    Bilinear interpolation of `stack` (..., height, width) laid out on `grid`
+    at every (lon, lat); returns (..., n_points).
+    """
+    t = grid['affineTransform']
+    height, width = stack.shape[-2:]
+    col = (np.asarray(lons) - t['translateX']) / t['scaleX'] - 0.5
+    row = (np.asarray(lats) - t['translateY']) / t['scaleY'] - 0.5
+    c0 = np.clip(np.floor(col).astype(int), 0, width - 2)
+    r0 = np.clip(np.floor(row).astype(int), 0, height - 2)
+    fc, fr = col - c0, row - r0
+    return (stack[..., r0, c0] * (1 - fc) * (1 - fr) + stack[..., r0, c0 + 1] * fc * (1 - fr)
+            + stack[..., r0 + 1, c0] * (1 - fc) * fr + stack[..., r0 + 1, c0 + 1] * fc * fr)
+
+def sample_chips(images: ee.ImageCollection, bands, points: list, res: float = 0.25,
+                 max_bands: int = 1000) -> dict:
+    """
+    Download one grid chip per run (all lead times stacked with toBands) and
+    sample every point locally with bilinear interpolation. Returns the same
+    column lists as export_properties.
+    """
+    bands = list(bands)
+    columns = ['initDate', 'date', 'name'] + bands
+    meta = get_info(images.map(lambda img: img.set('valid', GEE_Client._safe_time(img)))
+                          .reduceColumns(ee.Reducer.toList(3), ['system:index', 'creation_time', 'valid'])
+                          .get('list'))
+    if not meta:
+        return {c: [] for c in columns}
+
+    lons = np.array([p['lon'] for p in points], dtype='float64')
+    lats = np.array([p['lat'] for p in points], dtype='float64')
+    names = np.array([p['name'] for p in points], dtype=object)
+    grid = chip_grid(lons, lats, res)
+    per_request = max(1, max_bands // len(bands))
+
+    runs = {}
+    for idx, init_ms, valid_ms in meta:
+        runs.setdefault(init_ms, []).append((idx, valid_ms))
+
+    out = {c: [] for c in columns}
+    for init_ms, members in sorted(runs.items()):
+        for i in range(0, len(members), per_request):
+            chunk = members[i:i + per_request]
+            ids = [m[0] for m in chunk]
+            stack = images.filter(ee.Filter.inList('system:index', ids)).toBands()
+            pixels = ee.data.computePixels({'expression': stack, 'fileFormat': 'NUMPY_NDARRAY', 'grid': grid})
+            EEStats.record(pixels.nbytes)
+            cube = np.stack([np.stack([pixels[f'{idx}_{b}'].astype('float64') for b in bands]) for idx in ids])
+            values = bilinear_sample(cube, grid, lons, lats)          # (lead, band, point)
+            n_lead, n_pts = len(chunk), len(points)
+            out['initDate'].extend([init_ms] * (n_lead * n_pts))
+            out['date'].extend(np.repeat([m[1] for m in chunk], n_pts).tolist())
+            out['name'].extend(np.tile(names, n_lead).tolist())
+            for k, b in enumerate(bands):
+                out[b].extend(values[:, k, :].ravel().tolist())
+    return out
+
+def export_table(col: ee.FeatureCollection, columns, images: ee.ImageCollection,
+                 points: ee.FeatureCollection, mode: str = 'auto', page_size: int = None,
+                 point_list: list = None, res: float = 0.25):
+    """
+    Columns of the reduced collection, via getInfo ('json') or a CSV download
+    ('table'). 'auto' picks the table download above TABLE_EXPORT_CELLS.
+    'chip' skips the server reduction and samples grid chips of `images`
+    locally at `point_list` (fetched from `points` when not given).
+    """
+    if mode == 'chip':
+        bands = [c for c in columns if c not in ('initDate', 'date', 'name')]
+        return sample_chips(images, bands, point_list or points_from_collection(points), res)
+    if mode == 'auto':
+        mode = 'table' if estimate_cells(images, points, len(columns)) > TABLE_EXPORT_CELLS else 'json'
+    if mode == 'table':
+        return download_table(col, columns)
+    return export_properties(col, columns, page_size)
+
+#-- Parallel extraction --#
+QUOTA_MARKERS = ("too many concurrent", "quota", "rate limit", "429", "resource exhausted")
+
+def is_quota_error(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return any(m in msg for m in QUOTA_MARKERS)
+
+def run_extractions(jobs: dict, max_workers: int = 4, max_retries: int = 5, backoff: float = 2.0):
+    """
+    Run independent extraction jobs on at most `max_workers` threads and yield
+    (key, DataFrame) as each one finishes.
+
+    :param jobs: {key: callable returning a DataFrame}
+    :param max_workers: concurrent Earth Engine computations
+    :param max_retries: retries per job on quota / concurrency errors
+    :param backoff: base seconds of the exponential backoff (with jitter)
+    """
+    def _run(job):
+        for attempt in range(max_retries + 1):
+            try:
+                return job()
+            except Exception as e:
+                if attempt == max_retries or not is_quota_error(e):
+                    raise
+                time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_run, job): key for key, job in jobs.items()}
+        for fut in as_completed(futures):
+            key = futures[fut]
+            try:
+                yield key, fut.result()
+            except Exception as e:
+                print(f"Extraction failed for {key}: {e}")
+
 #-- Points of interest --#
 WIND_FARMS = [
     {"name": "W.F. Cupisnique",    "lon": -79.48, "lat":  -7.55},
@@ -89,15 +319,59 @@ def feature_collection_from_list(points) -> ee.FeatureCollection:
     feats = [ee.Feature(ee.Geometry.Point([p["lon"], p["lat"]]), {"name": p["name"]}) for p in points]
     return ee.FeatureCollection(feats)
 
-def to_lima_hour(ee_date):
-    return ee.Date(ee_date).format("YYYY-MM-dd'T'HH", 'America/Lima')
+def epoch_ms_to_lima(values) -> pd.DatetimeIndex:
+    """
+    Epoch milliseconds to tz-aware America/Lima timestamps in one cast.
+    """
+    return pd.to_datetime(np.asarray(values, dtype='float64'), unit='ms', utc=True).tz_convert('America/Lima')
+
+def list_inits(collection_id: str, start_date, end_date, extra_filter: ee.Filter = None) -> list:
+    """
+    Distinct 'creation_time' values (epoch ms, ascending) of `collection_id`
+    in [start_date, end_date], discovered with a single metadata query.
+    """
+    coll = (ee.ImageCollection(collection_id)
+            .filter(ee.Filter.rangeContains('creation_time',
+                                            ee.Date(start_date).millis(),
+                                            ee.Date(end_date).millis())))
+    if extra_filter is not None:
+        coll = coll.filter(extra_filter)
+    return get_info(coll.aggregate_array('creation_time').distinct().sort())
+
+def split_runs(df: pd.DataFrame, inits) -> dict:
+    """
+    {init_ms: rows of that run} for every requested init, empty when absent.
+    """
+    labels = epoch_ms_to_lima(inits)
+    groups = dict(tuple(df.groupby('initDate'))) if not df.empty else {}
+    return {int(ms): groups.get(label, df.iloc[0:0]).reset_index(drop=True)
+            for ms, label in zip(inits, labels)}
 
 #-- GFS Forecast --#
 class gfsForecast(GEE_Client):
-    def __init__(self, eFeaturesLocations, scale=27830, bands=('wwind10','t2m'), key_path=None):
+    collection_id = 'NOAA/GFS0P25'
+
+    MAX_FORECAST_HOURS = 384
+
+    def __init__(self, eFeaturesLocations, scale=27830, bands=('uwind10','vwind10','t2m'), key_path=None,
+                 points=None, grid_res=0.25, cycles=None, latest_runs=None,
+                 max_lead_hours=None, hourly_until=None, step_after=3):
+        """
+        :param cycles: init hours (UTC) to take, e.g. (0, 12); None takes all
+        :param latest_runs: keep only the N most recent inits found
+        :param max_lead_hours: drop lead times beyond this
+        :param hourly_until: keep every lead up to this hour, then every `step_after` hours
+        """
         super().__init__(key_path=key_path)
         self.scale = scale
         self.eFeaturesLocations = eFeaturesLocations
+        self.points = points          # [{'name','lon','lat'}] for mode='chip'
+        self.grid_res = grid_res
+        self.cycles = None if cycles is None else sorted(set(cycles))
+        self.latest_runs = latest_runs
+        self.max_lead_hours = max_lead_hours
+        self.hourly_until = hourly_until
+        self.step_after = step_after
         self.raw_bands = [
             'u_component_of_wind_10m_above_ground',
             'v_component_of_wind_10m_above_ground',
@@ -106,66 +380,94 @@ class gfsForecast(GEE_Client):
         self.renameBands = ['uwind10','vwind10','t2m']
         self.bands = list(bands)
         self.imgCollection = None
+        self.sourceCollection = None
+
+    def lead_hours(self) -> list:
+        """
+        Forecast hours kept by max_lead_hours / hourly_until, or None for all.
+        """
+        if self.max_lead_hours is None and self.hourly_until is None:
+            return None
+        last = self.MAX_FORECAST_HOURS if self.max_lead_hours is None else self.max_lead_hours
+        until = last if self.hourly_until is None else self.hourly_until
+        return [h for h in range(0, last + 1) if h <= until or (h - until) % self.step_after == 0]
+
+    def subset_signature(self) -> dict:
+        return {'cycles': self.cycles, 'latest_runs': self.latest_runs, 'leads': self.lead_hours()}
+
+    def _cycle_filter(self):
+        # system:time_start is the init time in NOAA/GFS0P25
+        return ee.Filter.Or(*[ee.Filter.calendarRange(h, h, 'hour') for h in self.cycles])
+
+    def available_inits(self, *, start_date, end_date) -> list:
+        inits = list_inits(self.collection_id, start_date, end_date,
+                           None if self.cycles is None else self._cycle_filter())
+        return inits[-self.latest_runs:] if self.latest_runs else inits
 
-    def _compute_wind_speed(self, img: ee.Image) -> ee.Image:
-        w10 = img.expression(
-            'sqrt(u*u + v*v)',
-            {
-                'u': img.select('u_component_of_wind_10m_above_ground'),
-                'v': img.select('v_component_of_wind_10m_above_ground'),
-            }
-        ).rename('wwind10')
-        return img.select(self.raw_bands).rename(self.renameBands).addBands(w10)
-
-    def getForecasts(self, *, start_date: str, end_date: str):
-        coll = (ee.ImageCollection('NOAA/GFS0P25')
-                .filter(ee.Filter.date(start_date, end_date))
-                .select(self.raw_bands)
-                .map(self._compute_wind_speed)
+    def getForecasts(self, *, start_date: str = None, end_date: str = None, initDates=None):
+        """
+        Runs initialised in [start_date, end_date), or the runs whose
+        'creation_time' (epoch ms) is in initDates. Init cycles and lead times
+        are subset server-side before any reduction.
+        """
+        if initDates is not None:
+            dateFilter = ee.Filter.inList('creation_time', ee.List(list(initDates)))
+        else:
+            dateFilter = ee.Filter.date(start_date, end_date)
+        coll = ee.ImageCollection(self.collection_id).filter(dateFilter)
+        if self.cycles is not None:
+            coll = coll.filter(self._cycle_filter())
+        leads = self.lead_hours()
+        if leads is not None:
+            coll = coll.filter(ee.Filter.inList('forecast_hours', ee.List(leads)))
+        # wind components are shipped as-is; speed and direction are computed locally
+        coll = (coll
+                .select(self.raw_bands, self.renameBands)
                 .select(self.bands))
+        self.sourceCollection = coll
 
         def _reduce(img: ee.Image):
-            t_valid = self._safe_time(img)
-            date_pe = to_lima_hour(t_valid)
-            idx = ee.String(img.get('system:index')).slice(0, 10)  # 'YYYYMMddHH'
-            init_utc = ee.Date.parse('YYYYMMddHH', idx)            # parsed in UTC
-            init_pe  = to_lima_hour(init_utc)
-
+            # valid and init times travel as epoch ms
             fc = img.reduceRegions(self.eFeaturesLocations, ee.Reducer.mean(), self.scale)
-            return fc.map(lambda f: f.set({'date': date_pe,
-                                           'initDate': init_pe,
-                                           'tz': 'America/Lima'}))
+            return fc.map(lambda f: f.set({'date': self._safe_time(img),
+                                           'initDate': img.get('creation_time')}))
 
         self.imgCollection = coll.map(_reduce)
 
-    def getDataFrame(self) -> pd.DataFrame:
+    def getDataFrame(self, page_size: int = None, mode: str = 'auto') -> pd.DataFrame:
+        """
+        All properties of the flattened collection in one request (or pages),
+        or as a CSV download for large results, or sampled from grid chips
+        with mode='chip' (see export_table).
+        """
         col = self.imgCollection.flatten()
-        initDate = pd.to_datetime(
-            [str(x)[:13] for x in col.aggregate_array('initDate').getInfo()],
-            format='%Y-%m-%dT%H', errors='coerce'
-        )
-        fdate = pd.to_datetime(
-            [str(x)[:13] for x in col.aggregate_array('date').getInfo()],
-            format='%Y-%m-%dT%H', errors='coerce'
-        )
+        props = export_table(col, ['initDate', 'date', 'name'] + self.bands,
+                             self.sourceCollection, self.eFeaturesLocations, mode, page_size,
+                             self.points, self.grid_res)
+        initDate = epoch_ms_to_lima(props['initDate'])
+        fdate = epoch_ms_to_lima(props['date'])
 
         out = {
             'initDate': initDate,
             'date': fdate,
-            'name': col.aggregate_array('name').getInfo()
+            'name': props['name']
         }
         for b in self.bands:
-            out[b] = col.aggregate_array(b).getInfo()
+            out[b] = props[b]
 
         df = pd.DataFrame(out).sort_values(['name','initDate','date']).reset_index(drop=True)
         return df
 
 #-- IFS Forecast --#
 class ifsForecast(GEE_Client):
-    def __init__(self, eFeaturesLocations, scale=28000, key_path=None):
+    collection_id = 'ECMWF/NRT_FORECAST/IFS/OPER'
+
+    def __init__(self, eFeaturesLocations, scale=28000, key_path=None, points=None, grid_res=0.25):
         super().__init__(key_path=key_path)
         self.scale = scale
         self.eFeaturesLocations = eFeaturesLocations
+        self.points = points          # [{'name','lon','lat'}] for mode='chip'
+        self.grid_res = grid_res
         self.raw_bands = [
             'u_component_of_wind_10m_sfc',
             'v_component_of_wind_10m_sfc',
@@ -173,71 +475,59 @@ class ifsForecast(GEE_Client):
             'v_component_of_wind_100m_sfc',
             'temperature_2m_sfc'
         ]
-        self.outBands = ['wwind10','wwind100','t2m']
+        self.outBands = ['uwind10','vwind10','uwind100','vwind100','t2m']
         self.imgCollection = None
+        self.sourceCollection = None
 
-    @staticmethod
-    def _ws(img: ee.Image, uVar: str, vVar: str, name: str) -> ee.Image:
-        w = img.expression('sqrt(u*u + v*v)', {'u': img.select(uVar), 'v': img.select(vVar)}).rename(name)
-        return img.addBands(w)
+    def available_inits(self, *, start_date, end_date) -> list:
+        return list_inits(self.collection_id, start_date, end_date)
 
-    def getForecasts(self, *, initDate):
+    def getForecasts(self, *, initDate=None, initDates=None):
         """
-        initDate in UTC ('YYYY-MM-DDTHH:mm:ss' or epoch ms) used to filter 'creation_time'.
+        initDate in UTC ('YYYY-MM-DDTHH:mm:ss' or epoch ms) used to filter 'creation_time',
+        or initDates, a list of them, to reduce every run in one graph.
         """
-        t_ms = ee.Date(initDate).millis() if isinstance(initDate, str) else ee.Number(initDate)
+        if initDates is None:
+            initDates = [initDate]
+        t_ms = [ee.Date(t).millis() if isinstance(t, str) else ee.Number(t) for t in initDates]
 
-        coll = (ee.ImageCollection('ECMWF/NRT_FORECAST/IFS/OPER')
-                .filter(ee.Filter.eq('creation_time', t_ms))
-                .select(self.raw_bands))
-
-        # Compute wind magnitudes (10 m & 100 m)
-        coll = coll.map(lambda img: self._ws(img,
-                                             'u_component_of_wind_10m_sfc',
-                                             'v_component_of_wind_10m_sfc',
-                                             'wwind10'))
-        coll = coll.map(lambda img: self._ws(img,
-                                             'u_component_of_wind_100m_sfc',
-                                             'v_component_of_wind_100m_sfc',
-                                             'wwind100'))
-
-        coll = coll.map(lambda img: img.select(['wwind10','wwind100','temperature_2m_sfc'],
-                                               self.outBands))
-
-        init_pe = to_lima_hour(t_ms)
+        # wind components (10 m & 100 m) are shipped as-is; speed and direction are computed locally
+        coll = (ee.ImageCollection(self.collection_id)
+                .filter(ee.Filter.inList('creation_time', ee.List(t_ms)))
+                .select(self.raw_bands, self.outBands))
+        self.sourceCollection = coll
 
         def _reduce(img: ee.Image):
-            t_valid = self._safe_time(img)
-            date_pe = to_lima_hour(t_valid)
+            # valid and init times travel as epoch ms
             fc = img.reduceRegions(self.eFeaturesLocations, ee.Reducer.mean(), self.scale)
-            return fc.map(lambda f: f.set({'date': date_pe,
-                                           'initDate': init_pe,
-                                           'tz': 'America/Lima'}))
+            return fc.map(lambda f: f.set({'date': self._safe_time(img),
+                                           'initDate': img.get('creation_time')}))
 
         self.imgCollection = coll.map(_reduce)
 
-    def getDataFrame(self) -> pd.DataFrame:
+    def getDataFrame(self, page_size: int = None, mode: str = 'auto') -> pd.DataFrame:
+        """
+        All properties of the flattened collection in one request (or pages),
+        or as a CSV download for large results, or sampled from grid chips
+        with mode='chip' (see export_table).
+        """
         col = self.imgCollection.flatten()
-        if col.size().getInfo() == 0:
-            return pd.DataFrame(columns=['initDate','date','name','wwind10','wwind100','t2m'])
+        props = export_table(col, ['initDate', 'date', 'name'] + self.outBands,
+                             self.sourceCollection, self.eFeaturesLocations, mode, page_size,
+                             self.points, self.grid_res)
+        if len(props['name']) == 0:
+            return pd.DataFrame(columns=['initDate','date','name'] + self.outBands)
 
-        initDate = pd.to_datetime(
-            [str(x)[:13] for x in col.aggregate_array('initDate').getInfo()],
-            format='%Y-%m-%dT%H', errors='coerce'
-        )
-        fdate = pd.to_datetime(
-            [str(x)[:13] for x in col.aggregate_array('date').getInfo()],
-            format='%Y-%m-%dT%H', errors='coerce'
-        )
+        initDate = epoch_ms_to_lima(props['initDate'])
+        fdate = epoch_ms_to_lima(props['date'])
 
         out = {
             'initDate': initDate,
             'date': fdate,
-            'name': col.aggregate_array('name').getInfo(),
-            'wwind10': col.aggregate_array('wwind10').getInfo(),
-            'wwind100': col.aggregate_array('wwind100').getInfo(),
-            't2m': col.aggregate_array('t2m').getInfo(),
+            'name': props['name']
         }
+        for b in self.outBands:
+            out[b] = props[b]
         df = pd.DataFrame(out).sort_values(['name','initDate','date']).reset_index(drop=True)
         return df
 
@@ -245,8 +535,17 @@ class ifsForecast(GEE_Client):
 if __name__ == "__main__":
     # --- Simple parameters (edit if needed) ---
     OUT_PARQUET = "../dataset/windSpeedFcs.parquet"
-    IFS_STEP_HOURS = 12
-    POWER_LAW_ALPHA = 0.14
+    ARCHIVE_DIR = "../dataset/forecastArchive"
+    RUN_CACHE_DIR = "../dataset/.runCache"
+    RUN_FRAME_VERSION = "3"   # tz-aware epoch-ms times, u/v wind components
+    # GFS subsetting: None keeps everything (native: hourly to 120 h, 3-hourly to 384 h)
+    GFS_SUBSET = dict(cycles=None, latest_runs=None, max_lead_hours=None, hourly_until=None, step_after=3)
+    IFS_PAGE_SIZE = 20000
+    EXTRACT_MODE = 'auto'     # 'json' | 'table' | 'chip' (local bilinear sampling of grid chips)
+    RUNS_PER_JOB = {'GFS': 2, 'IFS': 4}
+    EE_MAX_WORKERS = 4
+    POWER_LAW_ALPHA = 0.14    # fallback where no IFS shear was fitted
+    HUB_HEIGHT = 100
     DAYS_BACK = 7
 
     # --- Authentication (without key_path, it uses env vars) ---#
@@ -260,38 +559,93 @@ if __name__ == "__main__":
     end_date = dt.datetime.now()
     start_date = end_date - dt.timedelta(days=DAYS_BACK)
 
-    # --------- GFS ----------
-    gfs = gfsForecast(eFeaturesLocations=fc)
-    gfs.getForecasts(start_date=start_date.strftime("%Y-%m-%d"),
-                     end_date=end_date.strftime("%Y-%m-%d"))
-    df_gfs = gfs.getDataFrame()
-    df_gfs['model'] = 'GFS'
-    # 10m -> 100m via power law
-    df_gfs['wwind100'] = df_gfs['wwind10'] * ((90.0 / 10.0) ** POWER_LAW_ALPHA)
+    # --- Runs already extracted are reused; only new inits go to Earth Engine ---
+    cache = RunCache(RUN_CACHE_DIR)
+    models = {
+        'GFS': gfsForecast(eFeaturesLocations=fc, **GFS_SUBSET),
+        'IFS': ifsForecast(eFeaturesLocations=fc),
+    }
+    # chip sampling interpolates, so its runs are cached apart from server reductions
+    frame_version = f"{RUN_FRAME_VERSION}-{'chip' if EXTRACT_MODE == 'chip' else 'reduce'}"
+    signatures = {
+        'GFS': RunCache.signature(WIND_FARMS, models['GFS'].scale, models['GFS'].bands, frame_version,
+                                  **models['GFS'].subset_signature()),
+        'IFS': RunCache.signature(WIND_FARMS, models['IFS'].scale, models['IFS'].outBands, frame_version),
+    }
+
+    def extract_job(model: str, inits: list):
+        def job():
+            fcs = type(models[model])(eFeaturesLocations=fc, points=WIND_FARMS,
+                                      **(GFS_SUBSET if model == 'GFS' else {}))
+            fcs.getForecasts(initDates=inits)
+            df = fcs.getDataFrame(page_size=IFS_PAGE_SIZE if model == 'IFS' else None, mode=EXTRACT_MODE)
+            cache.store(model, signatures[model], split_runs(df, inits))
+            return df
+        return job
+
+    def finish(model: str, df: pd.DataFrame) -> pd.DataFrame:
+        # speed / direction, hub-height speed for GFS and lead times, as archived
+        df = add_speed_direction(df.sort_values(['name','initDate','date'], ignore_index=True))
+        df['model'] = model
+        if model == 'GFS':
+            # 10m -> hub height via power law
+            df['wwind100'] = extrapolate_speed(df, alpha, hub_height=HUB_HEIGHT, fallback=POWER_LAW_ALPHA)
+        df['nleadHour'] = ((df['date'] - df['initDate']).dt.total_seconds() / 3600).astype('Int64')
+        df['nleadDays'] = (df['nleadHour'] / 24).astype('Int64')
+        return df
+
+    # --------- Jobs: groups of runs not in the cache ----------
+    jobs = {'GFS': {}, 'IFS': {}}
+    cached = {}
+    for model, fcs in models.items():
+        inits = fcs.available_inits(start_date=start_date.strftime("%Y-%m-%d"),
+                                    end_date=end_date.strftime("%Y-%m-%dT%H:%M:%S"))
+        cached[model], missing = cache.split(model, signatures[model], inits)
+        print(f"{model} runs available: {len(inits)} | cached: {len(cached[model])} | to extract: {len(missing)}")
+        step = RUNS_PER_JOB[model]
+        for i in range(0, len(missing), step):
+            jobs[model][(model, missing[i])] = extract_job(model, missing[i:i + step])
+
+    archived = 0
+    def extract_and_archive(model: str) -> list:
+        # every finished job goes to the archive right away, not after the slowest one
+        global archived
+        frames = [finish(model, df) for df in cached[model] if not df.empty]
+        if frames:
+            archived += append_runs(pd.concat(frames, ignore_index=True), ARCHIVE_DIR)
+        for (_, tag), df in run_extractions(jobs[model], max_workers=EE_MAX_WORKERS):
+            print(f"{model} {tag}: {len(df)} rows")
+            if not df.empty:
+                frames.append(finish(model, df))
+                archived += append_runs(frames[-1], ARCHIVE_DIR)
+        return frames
 
     # --------- IFS ----------
-    ifs = ifsForecast(eFeaturesLocations=fc)
-    rng_date_ifs = pd.date_range(start=start_date.strftime('%Y-%m-%d'),
-                                 end=end_date.strftime('%Y-%m-%d'),
-                                 freq=f'{IFS_STEP_HOURS}h')
-    ifs_frames = []
-    for ts in rng_date_ifs:
-        try:
-            ifs.getForecasts(initDate=ts.strftime("%Y-%m-%dT%H:00:00"))
-            df_ifs = ifs.getDataFrame()
-            if not df_ifs.empty:
-                df_ifs['model'] = 'IFS'
-                ifs_frames.append(df_ifs)
-        except Exception as e:
-            print(f"IFS empty or error at init={ts}: {e}")
-
-    df_ifs = pd.concat(ifs_frames, ignore_index=True) if ifs_frames else pd.DataFrame(columns=df_gfs.columns)
+    # extracted first: its 10 m / 100 m pairs give the shear exponent used for GFS
+    frames_ifs = extract_and_archive('IFS')
+    df_ifs = pd.concat(frames_ifs, ignore_index=True) if frames_ifs else \
+        pd.DataFrame(columns=['initDate','date','name'] + models['IFS'].outBands)
+    # shear exponent per farm and hour of day from the IFS 10 m / 100 m pairs
+    alpha = fit_shear_alpha(df_ifs, high=HUB_HEIGHT) if frames_ifs else pd.Series(dtype='float64')
+    print(f"Shear exponents fitted: {len(alpha)} (farm, hour) pairs | median={alpha.median():.3f}")
+
+    # --------- GFS ----------
+    frames_gfs = extract_and_archive('GFS')
+    df_gfs = pd.concat(frames_gfs, ignore_index=True) if frames_gfs else \
+        pd.DataFrame(columns=['initDate','date','name'] + models['GFS'].bands)
+    if frames_gfs and frames_ifs:
+        coverage = shear_coverage(df_gfs, alpha)
+        print(f"GFS rows with a fitted shear exponent: {coverage:.1%}")
+        if coverage < 1:
+            fallback_farms = sorted(set(df_gfs['name']) - set(alpha.index.get_level_values(0)))
+            print(f"WARNING: alpha={POWER_LAW_ALPHA} used for farms without IFS fit: {fallback_farms}")
 
     # --------- Merge & save ----------
     df_all = pd.concat([df_gfs, df_ifs], ignore_index=True, sort=False)
-    df_all['nleadHour'] = ((df_all['date'] - df_all['initDate']).dt.total_seconds() / 3600).astype('Int64')
-    df_all['nleadDays'] = (df_all['nleadHour'] / 24).astype('Int64')
-
     os.makedirs(os.path.dirname(OUT_PARQUET), exist_ok=True)
     df_all.to_parquet(OUT_PARQUET, index=False)
     print(f"Parquet saved at: {OUT_PARQUET} | rows={len(df_all)}")
+    # runs were appended to the archive (model / init date partitions) as each job finished
+    print(f"Runs archived: {archived} -> {ARCHIVE_DIR}")
+    print(EEStats.summary())
+    print(cache.summary())
@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/forecast_archive.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import json
+import logging
+import datetime
+import pandas as pd
+from typing import Iterable, Optional
+
+from parquet_store import upsert_partitions, read_partitions
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TIMEZONE = "America/Lima"
+ARCHIVE_KEYS = ["model", "initDate", "name", "date"]
+MANIFEST_FILE = "_manifest.json"
+
+#-- Manifest --#
+def _run_key(model: str, init: pd.Timestamp) -> str:
+    return f"{model}|{init.isoformat()}"
+
+def load_manifest(root: str) -> dict:
+    """
+    Manifest is {'runs': {'model|initDate': {model, initDate, rows, farms, firstDate, lastDate, updated}}}.
+    """
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"runs": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, root: str):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def list_runs(root: str, model: Optional[str] = None) -> pd.DataFrame:
+    """
+    Archived runs, one row per (model, initDate), from the manifest.
+    """
+    runs = pd.DataFrame(list(load_manifest(root)["runs"].values()),
+                        columns=["model", "initDate", "rows", "farms", "firstDate", "lastDate", "updated"])
+    if model is not None:
+        runs = runs[runs["model"] == model]
+    for c in ["initDate", "firstDate", "lastDate"]:
+        runs[c] = pd.to_datetime(runs[c], utc=True).dt.tz_convert(ARCHIVE_TIMEZONE)
+    return runs.sort_values(["model", "initDate"]).reset_index(drop=True)
+
+#-- Writer --#
+def append_runs(df: pd.DataFrame, root: str) -> int:
+    """
+    Append forecast runs to the archive, partitioned by model and Lima init
+    date. A run already archived with at least as many rows is skipped, so a
+    refresh only writes new runs and runs that gained lead times.
+
+    :param df: rows with model, tz-aware initDate, name, date and the variables
+    :return: number of runs written
+    """
+    if df.empty:
+        return 0
+    manifest = load_manifest(root)
+    runs = manifest["runs"]
+    keep = []
+    for (model, init), rows in df.groupby(["model", "initDate"], sort=True):
+        known = runs.get(_run_key(model, init))
+        if known is None or known["rows"] < len(rows):
+            keep.append(rows)
+    if not keep:
+        return 0
+    new = pd.concat(keep, ignore_index=True)
+    upsert_partitions(new, root, keys=ARCHIVE_KEYS, partitions={
+        "model": new["model"],
+        "initDate": new["initDate"].dt.strftime("%Y-%m-%d"),
+    })
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    for (model, init), rows in new.groupby(["model", "initDate"], sort=True):
+        runs[_run_key(model, init)] = {
+            "model": model,
+            "initDate": init.isoformat(),
+            "rows": int(len(rows)),
+            "farms": sorted(rows["name"].unique().tolist()),
+            "firstDate": rows["date"].min().isoformat(),
+            "lastDate": rows["date"].max().isoformat(),
+            "updated": now,
+        }
+    save_manifest(manifest, root)
+    logger.info(f"Archived {len(keep)} runs ({len(new)} rows) under {root}")
+    return len(keep)
+
+#-- Reader --#
+def _as_lima(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(ARCHIVE_TIMEZONE) if ts.tz is None else ts.tz_convert(ARCHIVE_TIMEZONE)
+
+def read_archive(root: str, models: Optional[Iterable[str]] = None, start=None, end=None,
+                 farms: Optional[Iterable[str]] = None, columns: Optional[list] = None) -> pd.DataFrame:
+    """
+    Forecast rows for the selected models, init range [start, end] and farms.
+    Only partitions of the requested models and init dates are opened, and
+    the farm filter is pushed down into each file.
+    """
+    start = _as_lima(start) if start is not None else None
+    end = _as_lima(end) if end is not None else None
+    lo = start.strftime("%Y-%m-%d") if start is not None else ""
+    hi = end.strftime("%Y-%m-%d") if end is not None else "9999"
+    filters = {"initDate": lambda d: lo <= d <= hi}
+    if models is not None:
+        filters["model"] = list(models)
+    row_filters = [("name", "in", list(farms))] if farms is not None else None
+    if columns is not None:
+        columns = list(dict.fromkeys(["initDate"] + list(columns)))
+    df = read_partitions(root, filters=filters, columns=columns, row_filters=row_filters)
+    if df.empty:
+        return df
+    if start is not None:
+        df = df[df["initDate"] >= start]
+    if end is not None:
+        df = df[df["initDate"] <= end]
+    return df.sort_values([c for c in ARCHIVE_KEYS if c in df.columns]).reset_index(drop=True)
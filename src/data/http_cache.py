@@ -0,0 +1,174 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/http_cache.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import gzip
+import json
+import time
+import uuid
+import hashlib
+import logging
+import datetime
+import threading
+from typing import Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+EVICT_TO = 0.9  # evict down to this share of max_bytes, so a full cache is not walked on every store
+
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache of raw HTTP response bodies.
+
+    Entries are gzip files named by the SHA-256 of the request identity, with
+    a small JSON sidecar holding the expiry. Stored bytes are counted in
+    memory, and when they grow past `max_bytes` the least recently used
+    entries are evicted.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int = 512 * 1024 ** 2,
+        closed_ttl: float = 30 * 24 * 3600,
+        open_ttl: float = 30 * 60,
+    ):
+        """
+        :param root: cache directory
+        :param max_bytes: size budget for the stored bodies
+        :param closed_ttl: seconds to keep responses that end before yesterday
+        :param open_ttl: seconds to keep responses touching yesterday or today
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.closed_ttl = closed_ttl
+        self.open_ttl = open_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._bytes = None  # stored body bytes, counted on the first store
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """
+        Content address for a request, e.g. key(service, lectcodi, fechaIni, fechaFin).
+        """
+        return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    def ttl_for(self, last_day) -> float:
+        """
+        Short TTL while `last_day` is still being revised (today or yesterday).
+        """
+        if isinstance(last_day, datetime.datetime):
+            last_day = last_day.date()
+        if last_day >= datetime.date.today() - datetime.timedelta(days=1):
+            return self.open_ttl
+        return self.closed_ttl
+
+    def _paths(self, key: str):
+        folder = os.path.join(self.root, key[:2])
+        return os.path.join(folder, f"{key}.gz"), os.path.join(folder, f"{key}.json")
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def open(self, key: str, chunk_size: int = 1 << 16) -> Optional[Iterator[bytes]]:
+        """
+        Chunks of a fresh cached body, or None on a miss or an expired entry.
+        """
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                expires = json.load(f)["expires"]
+        except (OSError, ValueError, KeyError):
+            self._count(hit=False)
+            return None
+        if expires < time.time() or not os.path.exists(body_path):
+            self._count(hit=False)
+            return None
+        os.utime(body_path)  # recency for eviction
+        self._count(hit=True)
+
+        def _read():
+            with gzip.open(body_path, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        return
+                    yield chunk
+        return _read()
+
+    def _entries(self) -> list:
+        entries = []
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".gz"):
+                    path = os.path.join(folder, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _track(self, added: int) -> bool:
+        """
+        Add `added` bytes to the running total; True once it is over budget.
+        """
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += added
+            return self._bytes > self.max_bytes
+
+    def store(self, key: str, chunks: Iterable[bytes], ttl: float) -> Iterator[bytes]:
+        """
+        Pass `chunks` through while writing them to the cache. The entry is
+        committed only once the iterator has been fully consumed.
+        """
+        body_path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        tmp_path = f"{body_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with gzip.open(tmp_path, "wb", compresslevel=3) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            replaced = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            os.replace(tmp_path, body_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"expires": time.time() + ttl}, f)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if self._track(os.path.getsize(body_path) - replaced):
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the bodies fit in EVICT_TO
+        of `max_bytes`.
+        """
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                for p in (path, path[:-3] + ".json"):
+                    if os.path.exists(p):
+                        os.remove(p)
+                total -= size
+            self._bytes = total
+
+    def summary(self) -> str:
+        return f"HTTP cache: {self.hits} hits, {self.misses} misses"
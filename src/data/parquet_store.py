@@ -0,0 +1,121 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/parquet_store.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import re
+import glob
+import uuid
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PART_FILE = "part.parquet"
+
+#-- Helpers --#
+def partition_value(value) -> str:
+    """
+    Turn a partition value into a safe directory component.
+    """
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", str(value)).strip("_")
+
+def atomic_write_parquet(df: pd.DataFrame, filepath: str, schema: Optional[pa.Schema] = None, **kwargs):
+    """
+    Write `df` next to `filepath` and rename it into place, so readers
+    never see a half-written file. With `schema`, columns are cast to it and
+    its key/value metadata is stored in the file.
+    """
+    folder = os.path.dirname(filepath) or "."
+    os.makedirs(folder, exist_ok=True)
+    tmp_path = os.path.join(folder, f".{os.path.basename(filepath)}.{uuid.uuid4().hex}.tmp")
+    try:
+        if schema is not None:
+            pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), tmp_path, **kwargs)
+        else:
+            df.to_parquet(tmp_path, index=False, **kwargs)
+        os.replace(tmp_path, filepath)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+#-- Partitioned store --#
+def upsert_partitions(df: pd.DataFrame, root: str, keys: List[str],
+                      partitions: Dict[str, pd.Series],
+                      schema: Optional[pa.Schema] = None) -> int:
+    """
+    Upsert `df` into a hive-style partitioned Parquet store.
+
+    :param df: rows to write
+    :param root: store root directory
+    :param keys: columns identifying a row; incoming rows replace stored ones
+    :param partitions: ordered {partition name: Series aligned with df}
+    :param schema: optional Arrow schema every partition file is written with
+    :return: number of partition files written
+    """
+    if df.empty:
+        return 0
+    df = df.reset_index(drop=True)
+    partitions = {k: s.reset_index(drop=True) for k, s in partitions.items()}
+    labels = pd.DataFrame({k: s.map(partition_value) for k, s in partitions.items()},
+                          index=df.index)
+    written = 0
+    for values, idx in labels.groupby(list(partitions), sort=True).groups.items():
+        values = values if isinstance(values, tuple) else (values,)
+        folder = os.path.join(root, *[f"{k}={v}" for k, v in zip(partitions, values)])
+        filepath = os.path.join(folder, PART_FILE)
+        chunk = df.loc[idx]
+        if os.path.exists(filepath):
+            chunk = pd.concat([pd.read_parquet(filepath), chunk], ignore_index=True)
+        chunk = (chunk.drop_duplicates(subset=keys, keep="last")
+                      .sort_values(keys)
+                      .reset_index(drop=True))
+        atomic_write_parquet(chunk, filepath, schema=schema)
+        written += 1
+    logger.info(f"Upserted {len(df)} rows into {written} partitions under {root}")
+    return written
+
+def list_partitions(root: str, filters: Optional[Dict[str, Iterable]] = None) -> List[str]:
+    """
+    Partition files under `root` whose directory values pass `filters`.
+    A filter is either an iterable of accepted raw values or a predicate
+    over the directory value.
+    """
+    filters = filters or {}
+    accepted = {}
+    for k, f in filters.items():
+        accepted[k] = f if callable(f) else {partition_value(v) for v in f}
+    files = []
+    for filepath in sorted(glob.glob(os.path.join(root, "**", PART_FILE), recursive=True)):
+        parts = dict(p.split("=", 1) for p in os.path.relpath(os.path.dirname(filepath), root).split(os.sep)
+                     if "=" in p)
+        keep = True
+        for k, f in accepted.items():
+            if k not in parts:
+                continue
+            keep = f(parts[k]) if callable(f) else parts[k] in f
+            if not keep:
+                break
+        if keep:
+            files.append(filepath)
+    return files
+
+def read_partitions(root: str, filters: Optional[Dict[str, Iterable]] = None,
+                    columns: Optional[List[str]] = None,
+                    row_filters: Optional[list] = None) -> pd.DataFrame:
+    """
+    Read and concatenate the partitions selected by `filters`. `row_filters`
+    (pyarrow DNF, e.g. [('name', 'in', [...])]) is pushed down to each file.
+    """
+    files = list_partitions(root, filters)
+    if not files:
+        return pd.DataFrame(columns=columns)
+    return pd.concat([pd.read_parquet(f, columns=columns, filters=row_filters) for f in files],
+                     ignore_index=True)
@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/run_cache.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from parquet_store import atomic_write_parquet
+
+logger = logging.getLogger(__name__)
+
+
+class RunCache:
+    """
+    On-disk cache of extracted NWP runs.
+
+    A published run never changes, so once a run is settled its extraction is
+    stored under (model, extraction signature, init time) and reused by every
+    later refresh. Runs younger than `settle_hours` may still be missing lead
+    times and are never cached.
+    """
+
+    def __init__(self, root: str, settle_hours: Optional[Dict[str, float]] = None):
+        """
+        :param root: cache directory
+        :param settle_hours: {model: hours after init when the run is complete}
+        """
+        self.root = root
+        self.settle_hours = {"GFS": 12, "IFS": 18, **(settle_hours or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def signature(points: Iterable[dict], scale: float, bands: Iterable[str], version: str = "1",
+                  **options) -> str:
+        """
+        Extraction identity: the point set, the reduction scale, the bands,
+        the frame layout `version` and any JSON-serialisable subsetting `options`.
+        """
+        payload = {
+            "options": options,
+            "version": version,
+            "points": sorted([p["name"], round(p["lon"], 6), round(p["lat"], 6)] for p in points),
+            "scale": scale,
+            "bands": list(bands),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, model: str, signature: str, init_ms: int) -> str:
+        return os.path.join(self.root, model, signature, f"{int(init_ms)}.parquet")
+
+    def is_settled(self, model: str, init_ms: int, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - init_ms / 1000 >= self.settle_hours.get(model, 24) * 3600
+
+    def split(self, model: str, signature: str, inits: Iterable[int]) -> Tuple[List[pd.DataFrame], List[int]]:
+        """
+        Cached frames for `inits` and the init times that still need extracting.
+        """
+        frames, missing = [], []
+        for init_ms in inits:
+            path = self._path(model, signature, init_ms)
+            if os.path.exists(path):
+                frames.append(pd.read_parquet(path))
+            else:
+                missing.append(init_ms)
+        with self._lock:
+            self.hits += len(frames)
+            self.misses += len(missing)
+        return frames, missing
+
+    def store(self, model: str, signature: str, runs: Dict[int, pd.DataFrame]) -> int:
+        """
+        Persist the settled, non-empty runs of {init_ms: frame}; returns how many.
+        """
+        stored = 0
+        for init_ms, df in runs.items():
+            if df.empty or not self.is_settled(model, init_ms):
+                continue
+            atomic_write_parquet(df, self._path(model, signature, init_ms))
+            stored += 1
+        if stored:
+            logger.info(f"Cached {stored} {model} runs under {self.root}")
+        return stored
+
+    def summary(self) -> str:
+        return f"Run cache: {self.hits} runs reused, {self.misses} extracted"
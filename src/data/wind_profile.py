@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+#-----------------------------------------------------
+# @Project: ./windShortTermForecast/src
+# @File: ./windShortTermForecast/src/wind_profile.py
+# @Author: Carlos Enciso Ojeda
+# @Email: carlos.enciso.o@gmail.com
+#-----------------------------------------------------
+#-- Modules --#
+import numpy as np
+import pandas as pd
+from typing import Iterable
+
+DEFAULT_ALPHA = 0.14
+
+#-- Components --#
+def add_speed_direction(df: pd.DataFrame, heights: Iterable[int] = (10, 100)) -> pd.DataFrame:
+    """
+    Replace uwind{h}/vwind{h} by speed wwind{h} (m/s) and meteorological
+    direction wdir{h} (degrees the wind blows from) for every height present.
+    """
+    out = df.copy()
+    for h in heights:
+        u, v = f"uwind{h}", f"vwind{h}"
+        if u not in out.columns or v not in out.columns:
+            continue
+        uu = out[u].to_numpy(dtype="float64")
+        vv = out[v].to_numpy(dtype="float64")
+        out[f"wwind{h}"] = np.hypot(uu, vv)
+        out[f"wdir{h}"] = np.degrees(np.arctan2(-uu, -vv)) % 360
+        out = out.drop(columns=[u, v])
+    return out
+
+#-- Shear --#
+def fit_shear_alpha(df: pd.DataFrame, low: int = 10, high: int = 100, min_speed: float = 1.0,
+                    min_samples: int = 5, bounds=(0.0, 0.6)) -> pd.Series:
+    """
+    Power-law shear exponent per (name, local hour of `date`) fitted on paired
+    speeds, as the median of ln(w_high / w_low) / ln(high / low).
+
+    :param df: rows with name, tz-aware date, wwind{low} and wwind{high}
+    :param min_speed: ignore pairs where either speed is below this (calm, noisy ratio)
+    :param min_samples: groups with fewer valid pairs are left out
+    :param bounds: clip the fitted exponent to this range
+    :return: Series indexed by (name, hour)
+    """
+    w_low = df[f"wwind{low}"].to_numpy(dtype="float64")
+    w_high = df[f"wwind{high}"].to_numpy(dtype="float64")
+    ok = (w_low >= min_speed) & (w_high >= min_speed)
+    pairs = pd.DataFrame({
+        "name": df["name"].to_numpy()[ok],
+        "hour": df["date"].dt.hour.to_numpy()[ok],
+        "alpha": np.log(w_high[ok] / w_low[ok]) / np.log(high / low),
+    })
+    grouped = pairs.groupby(["name", "hour"])["alpha"]
+    alpha = grouped.median()[grouped.size() >= min_samples]
+    return alpha.clip(*bounds).rename("alpha")
+
+def fill_shear_hours(alpha: pd.Series) -> pd.Series:
+    """
+    Exponents for all 24 hours of every farm in `alpha`, interpolated around
+    the clock between fitted hours (IFS is 3-hourly, GFS hourly near init).
+    """
+    filled = []
+    for name, a in alpha.groupby(level=0):
+        hours = a.index.get_level_values(1).to_numpy(dtype="float64")
+        values = a.to_numpy(dtype="float64")
+        day = np.arange(24)
+        filled.append(pd.Series(np.interp(day, hours, values, period=24),
+                                index=pd.MultiIndex.from_product([[name], day], names=["name", "hour"])))
+    return pd.concat(filled).rename("alpha") if filled else alpha
+
+def shear_coverage(df: pd.DataFrame, alpha: pd.Series) -> float:
+    """
+    Share of rows of `df` whose (name, hour) resolves to a fitted or
+    interpolated exponent rather than the fallback.
+    """
+    if df.empty or not len(alpha):
+        return 0.0
+    keys = pd.MultiIndex.from_arrays([df["name"].to_numpy(), df["date"].dt.hour.to_numpy()])
+    return float(fill_shear_hours(alpha).reindex(keys).notna().mean())
+
+def extrapolate_speed(df: pd.DataFrame, alpha: pd.Series, ref_height: int = 10, hub_height: int = 100,
+                      fallback: float = DEFAULT_ALPHA) -> pd.Series:
+    """
+    wwind{ref_height} extrapolated to `hub_height` with the (name, hour) exponent
+    from `alpha`, interpolated between fitted hours, or `fallback` for farms
+    without any fitted exponent.
+    """
+    keys = pd.MultiIndex.from_arrays([df["name"].to_numpy(), df["date"].dt.hour.to_numpy()])
+    a = fill_shear_hours(alpha).reindex(keys).to_numpy(dtype="float64") if len(alpha) else np.full(len(df), np.nan)
+    a = np.where(np.isnan(a), fallback, a)
+    speed = df[f"wwind{ref_height}"].to_numpy(dtype="float64") * (hub_height / ref_height) ** a
+    return pd.Series(speed, index=df.index, name=f"wwind{hub_height}")